@@ -10,6 +10,10 @@ from utils.database import create_specialist_doctors
 if __name__ == '__main__':
     app = create_app()
 
+    # Demo accounts only: use the minimum bcrypt cost so seeding is fast
+    app.config['BCRYPT_LOG_ROUNDS'] = 4
+    bcrypt.init_app(app)
+
     with app.app_context():
         print("=" * 50)
         print("Adding Specialist Doctors to Database")
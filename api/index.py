@@ -1,4 +1,2 @@
-import os
-from app import create_app
-
-app = create_app(os.environ.get("FLASK_ENV", "production"))
+# Reuse the application object built by app.py instead of creating a second one
+from app import app  # noqa: F401
@@ -5,8 +5,12 @@ Main entry point for the Flask application
 
 import os
 from flask import Flask, render_template
+from jinja2 import FileSystemBytecodeCache
 from config import get_config
-from extensions import db, login_manager, bcrypt
+from extensions import db, login_manager, bcrypt, cache
+
+# Import models once at module level (registers them with SQLAlchemy)
+import models  # noqa: F401
 
 
 def create_app(config_name=None):
@@ -25,68 +29,99 @@ def create_app(config_name=None):
     db.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    cache.init_app(app)
+
+    # Development N+1 guard: log requests that run too many queries
+    if app.config.get("QUERY_COUNT_WARNING"):
+        from utils.database import install_query_counter
+        install_query_counter(app, app.config["QUERY_COUNT_WARNING"])
+
+    # Development slow-query log (Flask-SQLAlchemy records statement timings)
+    if app.config.get("SLOW_QUERY_THRESHOLD") and app.config.get("SQLALCHEMY_RECORD_QUERIES"):
+        from utils.database import install_slow_query_logger
+        install_slow_query_logger(app, app.config["SLOW_QUERY_THRESHOLD"])
+
+    # Jinja: skip template mtime checks and reuse compiled bytecode across
+    # worker restarts outside of debug mode
+    if not app.debug:
+        app.jinja_env.auto_reload = False
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
 
     # Configure Flask-Login
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
     login_manager.login_message_category = "info"
 
-    # Import models once inside app context (ensures SQLAlchemy registers them)
-    with app.app_context():
-        from models import (  # noqa: F401
-            user,
-            admin,
-            doctor,
-            patient,
-            specialization,
-            appointment,
-            treatment,
-        )
-
-        # Optional: create/seed DB only if explicitly enabled
-        # On Render, set INIT_DB=true once if you want to initialize tables
-        if os.environ.get("INIT_DB", "").lower() == "true":
+    # Optional: create/seed DB only if explicitly enabled
+    # On Render, set INIT_DB=true once if you want to initialize tables
+    if os.environ.get("INIT_DB", "").lower() == "true":
+        with app.app_context():
             db.create_all()
             from utils.database import init_db
             init_db(db, bcrypt)
 
-    # Register blueprints
-    from controllers.auth_controller import auth_bp
-    from controllers.admin_controller import admin_bp
-    from controllers.doctor_controller import doctor_bp
-    from controllers.patient_controller import patient_bp
+    # One-shot initialization: `flask --app app init-db`
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create tables and seed default data"""
+        from utils.database import init_db
+
+        db.create_all()
+        init_db(db, bcrypt)
 
+    # Register blueprints (each controller is imported right before use)
+    from controllers.auth_controller import auth_bp
     app.register_blueprint(auth_bp)
+
+    from controllers.admin_controller import admin_bp
     app.register_blueprint(admin_bp, url_prefix="/admin")
+
+    from controllers.doctor_controller import doctor_bp
     app.register_blueprint(doctor_bp, url_prefix="/doctor")
+
+    from controllers.patient_controller import patient_bp
     app.register_blueprint(patient_bp, url_prefix="/patient")
 
     # User loader callback
     @login_manager.user_loader
     def load_user(user_id):
+        from sqlalchemy.orm import joinedload, load_only
         from models.user import User
-        return User.query.get(int(user_id))
+        # Fold the role profile into the same query; views read
+        # current_user.doctor / current_user.patient without another SELECT.
+        # Only the columns pages render are loaded; password_hash and the
+        # timestamps load on first access (e.g. change password)
+        return db.session.get(User, int(user_id), options=[
+            load_only(User.id, User.username, User.email, User.role, User.is_active),
+            joinedload(User.doctor),
+            joinedload(User.patient),
+        ])
 
     # Home route
     @app.route("/")
     def index():
         from models.doctor import Doctor
-        from models.patient import Patient
-        from models.appointment import Appointment
         from models.specialization import Specialization
         from models.user import User
+        from utils.database import get_home_stats, get_top_specializations
 
-        total_doctors = Doctor.query.count()
-        total_patients = Patient.query.count()
-        total_appointments = Appointment.query.count()
-        total_specializations = Specialization.query.count()
+        (total_doctors, total_patients,
+         total_appointments, total_specializations) = get_home_stats()
 
-        specializations = (
-            Specialization.query.order_by(Specialization.name).limit(6).all()
-        )
+        specializations = get_top_specializations(6)
 
+        # Project only the columns index.html renders (lightweight rows,
+        # no ORM object construction)
         featured_doctors = (
-            Doctor.query.join(User, Doctor.user_id == User.id)
+            db.session.query(
+                Doctor.id,
+                Doctor.name,
+                Doctor.qualification,
+                Doctor.experience_years,
+                Specialization.name.label("specialization_name"),
+            )
+            .join(User, Doctor.user_id == User.id)
+            .join(Specialization, Doctor.specialization_id == Specialization.id)
             .filter(User.is_active.is_(True))
             .order_by(Doctor.experience_years.desc())
             .limit(4)
@@ -103,6 +138,21 @@ def create_app(config_name=None):
             featured_doctors=featured_doctors,
         )
 
+    # Context processor (values are fixed for the app's lifetime, so build once)
+    app_info = {
+        "app_name": app.config.get("APP_NAME", "Hospital Management System"),
+        "app_version": app.config.get("APP_VERSION", "1.0.0"),
+    }
+
+    @app.context_processor
+    def inject_app_info():
+        return app_info
+
+    # Pre-render a static 500 page so the error path still has a response
+    # when rendering itself fails (e.g. a broken session or template)
+    with app.test_request_context():
+        error_500_page = render_template("errors/500.html")
+
     # Error handlers
     @app.errorhandler(403)
     def forbidden(e):
@@ -114,15 +164,10 @@ def create_app(config_name=None):
 
     @app.errorhandler(500)
     def internal_server_error(e):
-        return render_template("errors/500.html"), 500
-
-    # Context processor
-    @app.context_processor
-    def inject_app_info():
-        return {
-            "app_name": app.config.get("APP_NAME", "Hospital Management System"),
-            "app_version": app.config.get("APP_VERSION", "1.0.0"),
-        }
+        try:
+            return render_template("errors/500.html"), 500
+        except Exception:
+            return error_500_page, 500
 
     return app
 
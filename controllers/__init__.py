@@ -3,11 +3,16 @@ Controllers package
 Contains all route handlers and business logic for the application
 """
 
-# Import blueprints to make them available
-from controllers.auth_controller import auth_bp
-from controllers.admin_controller import admin_bp
-from controllers.doctor_controller import doctor_bp
-from controllers.patient_controller import patient_bp
+from importlib import import_module
+
+# Blueprints are imported lazily (PEP 562) so that importing one controller
+# module does not pull in every other controller and its dependencies
+_BLUEPRINT_MODULES = {
+    'auth_bp': 'controllers.auth_controller',
+    'admin_bp': 'controllers.admin_controller',
+    'doctor_bp': 'controllers.doctor_controller',
+    'patient_bp': 'controllers.patient_controller'
+}
 
 __all__ = [
     'auth_bp',
@@ -15,3 +20,10 @@ __all__ = [
     'doctor_bp',
     'patient_bp'
 ]
+
+
+def __getattr__(name):
+    """Import a blueprint on first attribute access"""
+    if name in _BLUEPRINT_MODULES:
+        return getattr(import_module(_BLUEPRINT_MODULES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
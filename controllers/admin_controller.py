@@ -3,9 +3,12 @@ Admin Controller
 Handles all admin operations: dashboard, manage doctors, patients, appointments
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import current_user
-from extensions import db, bcrypt
+from sqlalchemy import select, union_all, literal, null, cast
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+from extensions import db, bcrypt, cache, HASH_EXECUTOR
 from models.user import User
 from models.admin import Admin
 from models.doctor import Doctor
@@ -13,12 +16,19 @@ from models.patient import Patient
 from models.specialization import Specialization
 from models.appointment import Appointment
 from utils.decorators import admin_required
-from utils.helpers import validate_email, validate_phone, sanitize_string
-from datetime import datetime, date
+from utils.helpers import validate_email, validate_phone, sanitize_string, calculate_age, flash_errors
+from utils.database import (
+    clear_stats_cache,
+    get_dashboard_stats, get_specialization_summaries, paginate
+)
+from datetime import date
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__)
 
+# Shortest term accepted by the global search
+MIN_SEARCH_LENGTH = 2
+
 
 @admin_bp.route('/dashboard')
 @admin_required
@@ -27,41 +37,25 @@ def dashboard():
     Admin dashboard with statistics
     Shows total doctors, patients, appointments
     """
-    # Get statistics
-    total_doctors = Doctor.query.count()
-    total_patients = Patient.query.count()
-    total_appointments = Appointment.query.count()
-    booked_appointments = Appointment.query.filter_by(status='Booked').count()
-    completed_appointments = Appointment.query.filter_by(status='Completed').count()
-    cancelled_appointments = Appointment.query.filter_by(status='Cancelled').count()
-    total_specializations = Specialization.query.count()
+    # Get statistics (one aggregate query)
+    today = date.today()
+    stats = get_dashboard_stats(today)
 
     # Get recent appointments
-    recent_appointments = Appointment.query.order_by(
+    recent_appointments = Appointment.query.options(
+        selectinload(Appointment.patient),
+        selectinload(Appointment.doctor)
+    ).order_by(
         Appointment.booking_date.desc()
     ).limit(10).all()
 
-    # Get today's appointments (pending/booked for today)
-    today = date.today()
-    pending_appointments = Appointment.query.filter_by(
-        appointment_date=today,
-        status='Booked'
-    ).count()
-
     # Get specializations list for display
-    specializations = Specialization.query.order_by(Specialization.name).all()
+    specializations = get_specialization_summaries()
 
     return render_template('admin/dashboard.html',
-                         total_doctors=total_doctors,
-                         total_patients=total_patients,
-                         total_appointments=total_appointments,
-                         booked_appointments=booked_appointments,
-                         completed_appointments=completed_appointments,
-                         cancelled_appointments=cancelled_appointments,
-                         total_specializations=total_specializations,
                          recent_appointments=recent_appointments,
-                         pending_appointments=pending_appointments,
-                         specializations=specializations)
+                         specializations=specializations,
+                         **stats)
 
 
 # ==================== DOCTOR MANAGEMENT ====================
@@ -73,20 +67,31 @@ def manage_doctors():
     View all doctors
     """
     search_query = request.args.get('search', '').strip()
+    page = request.args.get('page', 1, type=int)
 
     if search_query:
-        # Search doctors by name or specialization
-        doctors = Doctor.query.join(Specialization).filter(
+        # Search doctors by name or specialization (reuse the join to load
+        # specialization, and load user in the same query)
+        query = Doctor.query.join(Specialization).options(
+            contains_eager(Doctor.specialization),
+            joinedload(Doctor.user)
+        ).filter(
             db.or_(
                 Doctor.name.ilike(f'%{search_query}%'),
                 Specialization.name.ilike(f'%{search_query}%')
             )
-        ).order_by(Doctor.name).all()
+        )
     else:
-        doctors = Doctor.get_all_doctors()
+        query = Doctor.query.options(
+            joinedload(Doctor.user),
+            joinedload(Doctor.specialization)
+        )
+
+    pagination = paginate(query.order_by(Doctor.name), page, current_app.config['ITEMS_PER_PAGE'])
 
     return render_template('admin/manage_doctors.html',
-                         doctors=doctors,
+                         doctors=pagination.items,
+                         pagination=pagination,
                          search_query=search_query)
 
 
@@ -132,30 +137,31 @@ def add_doctor():
         if contact_number and not validate_phone(contact_number):
             errors.append('Please enter a valid 10-digit phone number.')
 
-        # Check username uniqueness
-        if User.query.filter_by(username=username).first():
-            errors.append('Username already exists.')
-
-        # Check email uniqueness
-        if User.query.filter_by(email=email).first():
-            errors.append('Email already registered.')
-
         # Password length
         if len(password) < 6:
             errors.append('Password must be at least 6 characters long.')
 
+        # Start hashing in the background while the uniqueness check runs
+        hash_future = None if errors else HASH_EXECUTOR.submit(bcrypt.generate_password_hash, password)
+
+        # Check username/email uniqueness
+        username_taken, email_taken = User.find_conflicts(username=username, email=email)
+        if username_taken:
+            errors.append('Username already exists.')
+        if email_taken:
+            errors.append('Email already registered.')
+
         if errors:
-            for error in errors:
-                flash(error, 'danger')
-            specializations = Specialization.get_all_specializations()
+            flash_errors(errors)
+            specializations = get_specialization_summaries()
             return render_template('admin/add_doctor.html',
                                  specializations=specializations,
                                  form_data=request.form)
 
         # Create doctor
         try:
-            # Hash password
-            password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+            # Collect the password hash started above
+            password_hash = hash_future.result().decode('utf-8')
 
             # Create user
             user = User(
@@ -164,31 +170,46 @@ def add_doctor():
                 password_hash=password_hash,
                 role='doctor'
             )
-            db.session.add(user)
-            db.session.flush()
 
-            # Create doctor profile
+            # Create doctor profile, linked through the relationship so both
+            # rows are inserted in the single flush at commit
             doctor = Doctor(
-                user_id=user.id,
                 name=name,
                 specialization_id=int(specialization_id),
                 license_number=license_number if license_number else None,
                 qualification=qualification if qualification else None,
                 experience_years=int(experience_years) if experience_years else None,
-                contact_number=contact_number
+                contact_number=contact_number,
+                user=user
             )
             db.session.add(doctor)
             db.session.commit()
+            clear_stats_cache()
 
             flash(f'Doctor {name} added successfully!', 'success')
             return redirect(url_for('admin.manage_doctors'))
 
+        except IntegrityError as e:
+            # Lost a race with a concurrent insert: the unique indexes on
+            # users.username/users.email are the final arbiter
+            db.session.rollback()
+            username_taken, email_taken = User.find_integrity_conflicts(e, username, email)
+            if username_taken:
+                flash('Username already exists.', 'danger')
+            if email_taken:
+                flash('Email already registered.', 'danger')
+            if not (username_taken or email_taken):
+                flash('Could not add doctor: duplicate record.', 'danger')
+            return render_template('admin/add_doctor.html',
+                                 specializations=get_specialization_summaries(),
+                                 form_data=request.form)
+
         except Exception as e:
             db.session.rollback()
             flash(f'Error adding doctor: {str(e)}', 'danger')
 
     # GET request
-    specializations = Specialization.get_all_specializations()
+    specializations = get_specialization_summaries()
     return render_template('admin/add_doctor.html', specializations=specializations)
 
 
@@ -198,7 +219,7 @@ def edit_doctor(doctor_id):
     """
     Edit doctor information
     """
-    doctor = Doctor.query.get_or_404(doctor_id)
+    doctor = Doctor.query.options(joinedload(Doctor.user)).filter_by(id=doctor_id).first_or_404()
 
     if request.method == 'POST':
         # Get form data
@@ -229,14 +250,13 @@ def edit_doctor(doctor_id):
             errors.append('Please enter a valid 10-digit phone number.')
 
         # Check email uniqueness (excluding current doctor)
-        existing_email = User.query.filter_by(email=email).first()
-        if existing_email and existing_email.id != doctor.user_id:
+        if email != doctor.user.email and \
+                User.find_conflicts(email=email, exclude_user_id=doctor.user_id)[1]:
             errors.append('Email already registered to another user.')
 
         if errors:
-            for error in errors:
-                flash(error, 'danger')
-            specializations = Specialization.get_all_specializations()
+            flash_errors(errors)
+            specializations = get_specialization_summaries()
             return render_template('admin/edit_doctor.html',
                                  doctor=doctor,
                                  specializations=specializations)
@@ -262,7 +282,7 @@ def edit_doctor(doctor_id):
             flash(f'Error updating doctor: {str(e)}', 'danger')
 
     # GET request
-    specializations = Specialization.get_all_specializations()
+    specializations = get_specialization_summaries()
     return render_template('admin/edit_doctor.html',
                          doctor=doctor,
                          specializations=specializations)
@@ -274,7 +294,7 @@ def delete_doctor(doctor_id):
     """
     Delete a doctor
     """
-    doctor = Doctor.query.get_or_404(doctor_id)
+    doctor = Doctor.query.options(joinedload(Doctor.user)).filter_by(id=doctor_id).first_or_404()
 
     try:
         doctor_name = doctor.name
@@ -284,6 +304,7 @@ def delete_doctor(doctor_id):
         db.session.delete(doctor)
         db.session.delete(user)
         db.session.commit()
+        clear_stats_cache()
 
         flash(f'Doctor {doctor_name} deleted successfully.', 'success')
 
@@ -300,7 +321,7 @@ def toggle_doctor_active(doctor_id):
     """
     Activate or deactivate a doctor account
     """
-    doctor = Doctor.query.get_or_404(doctor_id)
+    doctor = Doctor.query.options(joinedload(Doctor.user)).filter_by(id=doctor_id).first_or_404()
 
     try:
         if doctor.user.is_active:
@@ -325,21 +346,26 @@ def manage_patients():
     View all patients
     """
     search_query = request.args.get('search', '').strip()
+    page = request.args.get('page', 1, type=int)
+    query = Patient.query.options(joinedload(Patient.user))
 
     if search_query:
-        # Search patients by name, contact, or ID
-        patients = Patient.query.filter(
-            db.or_(
-                Patient.name.ilike(f'%{search_query}%'),
-                Patient.contact_number.ilike(f'%{search_query}%'),
-                Patient.id.like(f'%{search_query}%')
-            )
-        ).order_by(Patient.name).all()
-    else:
-        patients = Patient.get_all_patients()
+        # Search patients by name, contact, or ID (exact match on the
+        # primary key for numeric input instead of LIKE on an integer)
+        conditions = [
+            Patient.name.ilike(f'%{search_query}%'),
+            Patient.contact_number.ilike(f'%{search_query}%')
+        ]
+        if search_query.isdigit():
+            conditions.append(Patient.id == int(search_query))
+
+        query = query.filter(db.or_(*conditions))
+
+    pagination = paginate(query.order_by(Patient.name), page, current_app.config['ITEMS_PER_PAGE'])
 
     return render_template('admin/manage_patients.html',
-                         patients=patients,
+                         patients=pagination.items,
+                         pagination=pagination,
                          search_query=search_query)
 
 
@@ -349,12 +375,26 @@ def view_patient(patient_id):
     """
     View patient details and history
     """
-    patient = Patient.query.get_or_404(patient_id)
-    appointments = patient.appointments.order_by(
+    patient = Patient.query.options(
+        joinedload(Patient.user)
+    ).filter_by(id=patient_id).first_or_404()
+
+    # Load the whole appointment tree up front (doctor, specialization,
+    # treatment) so the template renders without further queries
+    appointments = Appointment.query.options(
+        selectinload(Appointment.doctor).selectinload(Doctor.specialization),
+        selectinload(Appointment.treatment)
+    ).filter_by(patient_id=patient.id).order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
     ).all()
-    treatment_history = patient.get_treatment_history()
+
+    # Same ordering as Patient.get_treatment_history(), from the loaded rows
+    treatment_history = sorted(
+        (appointment.treatment for appointment in appointments if appointment.treatment),
+        key=lambda treatment: treatment.treatment_date,
+        reverse=True
+    )
 
     return render_template('admin/view_patient.html',
                          patient=patient,
@@ -368,7 +408,7 @@ def edit_patient(patient_id):
     """
     Edit patient information
     """
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.options(joinedload(Patient.user)).filter_by(id=patient_id).first_or_404()
 
     if request.method == 'POST':
         # Get form data
@@ -396,13 +436,12 @@ def edit_patient(patient_id):
             errors.append('Please enter a valid 10-digit phone number.')
 
         # Check email uniqueness (excluding current patient)
-        existing_email = User.query.filter_by(email=email).first()
-        if existing_email and existing_email.id != patient.user_id:
+        if email != patient.user.email and \
+                User.find_conflicts(email=email, exclude_user_id=patient.user_id)[1]:
             errors.append('Email already registered to another user.')
 
         if errors:
-            for error in errors:
-                flash(error, 'danger')
+            flash_errors(errors)
             return render_template('admin/edit_patient.html', patient=patient)
 
         # Update patient
@@ -434,7 +473,7 @@ def toggle_patient_active(patient_id):
     """
     Activate or deactivate (blacklist) a patient account
     """
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.options(joinedload(Patient.user)).filter_by(id=patient_id).first_or_404()
 
     try:
         if patient.user.is_active:
@@ -461,6 +500,7 @@ def view_appointments():
     status_filter = request.args.get('status', '')
     date_filter = request.args.get('date', '')
     search_query = request.args.get('search', '').strip()
+    page = request.args.get('page', 1, type=int)
 
     query = Appointment.query
 
@@ -470,26 +510,36 @@ def view_appointments():
 
     if date_filter:
         try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
+            filter_date = date.fromisoformat(date_filter)
             query = query.filter_by(appointment_date=filter_date)
-        except:
+        except ValueError:
             pass
 
     if search_query:
-        query = query.join(Patient).join(Doctor).filter(
+        # Populate patient/doctor from the joins the search already needs
+        query = query.join(Patient).join(Doctor).options(
+            contains_eager(Appointment.patient),
+            contains_eager(Appointment.doctor).selectinload(Doctor.specialization)
+        ).filter(
             db.or_(
                 Patient.name.ilike(f'%{search_query}%'),
                 Doctor.name.ilike(f'%{search_query}%')
             )
         )
+    else:
+        query = query.options(
+            selectinload(Appointment.patient),
+            selectinload(Appointment.doctor).selectinload(Doctor.specialization)
+        )
 
-    appointments = query.order_by(
+    pagination = paginate(query.order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
-    ).all()
+    ), page, current_app.config['ITEMS_PER_PAGE'])
 
     return render_template('admin/view_appointments.html',
-                         appointments=appointments,
+                         appointments=pagination.items,
+                         pagination=pagination,
                          status_filter=status_filter,
                          date_filter=date_filter,
                          search_query=search_query)
@@ -501,7 +551,7 @@ def view_appointment_details(appointment_id):
     """
     View detailed appointment information
     """
-    appointment = Appointment.query.get_or_404(appointment_id)
+    appointment = db.get_or_404(Appointment, appointment_id)
 
     return render_template('admin/appointment_details.html',
                          appointment=appointment)
@@ -515,7 +565,7 @@ def manage_specializations():
     """
     View and manage specializations
     """
-    specializations = Specialization.get_all_specializations()
+    specializations = Specialization.get_all_specializations(include_doctors=True)
 
     return render_template('admin/manage_specializations.html',
                          specializations=specializations)
@@ -544,6 +594,7 @@ def add_specialization():
             specialization = Specialization(name=name, description=description)
             db.session.add(specialization)
             db.session.commit()
+            clear_stats_cache()
 
             flash(f'Specialization {name} added successfully!', 'success')
             return redirect(url_for('admin.manage_specializations'))
@@ -557,6 +608,105 @@ def add_specialization():
 
 # ==================== SEARCH ====================
 
+@cache.memoize(timeout=30)
+def global_search(query, limit=20):
+    """
+    Search doctors, patients and appointments for the admin search page
+    Results are cached briefly so repeated searches don't re-scan
+
+    Args:
+        query: Search term
+        limit: Maximum results per entity type
+
+    Returns:
+        Tuple of (doctors, patients, appointments) lists of dicts
+    """
+    # Search doctors, patients and appointments in one UNION ALL round-trip.
+    # Each branch projects the same column shape (kind, id, name, subtitle,
+    # tag, contact, day, is_active) and keeps its own LIMIT.
+    pattern = f'%{query}%'
+
+    patient_conditions = [
+        Patient.name.ilike(pattern),
+        Patient.contact_number.ilike(pattern)
+    ]
+    if query.isdigit():
+        patient_conditions.append(Patient.id == int(query))
+
+    branches = [
+        select(
+            literal('doctor').label('kind'),
+            Doctor.id,
+            Doctor.name,
+            Doctor.qualification.label('subtitle'),
+            Specialization.name.label('tag'),
+            Doctor.contact_number.label('contact'),
+            cast(null(), db.Date).label('day'),
+            User.is_active
+        ).join(Specialization, Doctor.specialization_id == Specialization.id)
+         .join(User, Doctor.user_id == User.id)
+         .where(Doctor.name.ilike(pattern))
+         .order_by(Doctor.name).limit(limit),
+        select(
+            literal('patient').label('kind'),
+            Patient.id,
+            Patient.name,
+            Patient.gender.label('subtitle'),
+            Patient.blood_group.label('tag'),
+            Patient.contact_number.label('contact'),
+            Patient.date_of_birth.label('day'),
+            cast(null(), db.Boolean).label('is_active')
+        ).where(db.or_(*patient_conditions))
+         .order_by(Patient.name).limit(limit),
+        select(
+            literal('appointment').label('kind'),
+            Appointment.id,
+            Patient.name,
+            Doctor.name.label('subtitle'),
+            Appointment.status.label('tag'),
+            cast(null(), db.String).label('contact'),
+            Appointment.appointment_date.label('day'),
+            cast(null(), db.Boolean).label('is_active')
+        ).join(Patient, Appointment.patient_id == Patient.id)
+         .join(Doctor, Appointment.doctor_id == Doctor.id)
+         .where(db.or_(Patient.name.ilike(pattern), Doctor.name.ilike(pattern)))
+         .order_by(Appointment.appointment_date.desc()).limit(limit),
+    ]
+    # Wrap each branch so its ORDER BY/LIMIT is valid inside the union
+    stmt = union_all(*(select(branch.subquery()) for branch in branches))
+
+    doctors, patients, appointments = [], [], []
+    for row in db.session.execute(stmt):
+        if row.kind == 'doctor':
+            doctors.append({
+                'id': row.id,
+                'name': row.name,
+                'qualification': row.subtitle,
+                'specialization_name': row.tag,
+                'contact_number': row.contact,
+                'is_active': row.is_active
+            })
+        elif row.kind == 'patient':
+            patients.append({
+                'id': row.id,
+                'name': row.name,
+                'gender': row.subtitle,
+                'blood_group': row.tag,
+                'contact_number': row.contact,
+                'age': calculate_age(row.day)
+            })
+        else:
+            appointments.append({
+                'id': row.id,
+                'patient_name': row.name,
+                'doctor_name': row.subtitle,
+                'status': row.tag,
+                'appointment_date': row.day
+            })
+
+    return doctors, patients, appointments
+
+
 @admin_bp.route('/search')
 @admin_required
 def search():
@@ -569,19 +719,12 @@ def search():
         flash('Please enter a search term.', 'info')
         return redirect(url_for('admin.dashboard'))
 
-    # Search doctors
-    doctors = Doctor.search(query)
-
-    # Search patients
-    patients = Patient.search(query)
+    # Very short terms match most rows; numeric IDs are still allowed
+    if len(query) < MIN_SEARCH_LENGTH and not query.isdigit():
+        flash(f'Please enter at least {MIN_SEARCH_LENGTH} characters to search.', 'info')
+        return redirect(url_for('admin.dashboard'))
 
-    # Search appointments
-    appointments = Appointment.query.join(Patient).join(Doctor).filter(
-        db.or_(
-            Patient.name.ilike(f'%{query}%'),
-            Doctor.name.ilike(f'%{query}%')
-        )
-    ).limit(20).all()
+    doctors, patients, appointments = global_search(query)
 
     return render_template('admin/search_results.html',
                          query=query,
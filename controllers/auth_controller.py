@@ -3,18 +3,32 @@ Authentication Controller
 Handles login, logout, and patient registration
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, make_response
 from flask_login import login_user, logout_user, current_user
-from extensions import db, bcrypt
+from sqlalchemy import select, bindparam
+from sqlalchemy.exc import IntegrityError
+from extensions import db, bcrypt, cache, HASH_EXECUTOR
 from models.user import User
 from models.patient import Patient
-from utils.decorators import anonymous_required
-from utils.helpers import validate_email, validate_phone, sanitize_string
-from datetime import datetime
+from utils.decorators import anonymous_required, dashboard_url_for
+from utils.helpers import validate_email, validate_phone, sanitize_string, parse_date
+from utils.database import clear_stats_cache
+from functools import lru_cache
+import secrets
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__)
 
+# Built once at import; each login only binds the username and reuses the
+# cached compiled form
+LOGIN_USER_STMT = select(User).where(User.username == bindparam('username'))
+
+
+@lru_cache(maxsize=None)
+def _dummy_password_hash(log_rounds):
+    """Hash checked when the username is unknown (same cost as real hashes)"""
+    return bcrypt.generate_password_hash(secrets.token_hex(16), log_rounds).decode('utf-8')
+
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 @anonymous_required
@@ -36,9 +50,15 @@ def login():
             return render_template('login.html')
 
         # Find user
-        user = User.query.filter_by(username=username).first()
+        user = db.session.execute(LOGIN_USER_STMT, {'username': username}).scalar_one_or_none()
+
+        # Verify password (against a dummy hash for unknown users, so the
+        # response time does not reveal whether the username exists)
+        log_rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+        password_hash = user.password_hash if user else _dummy_password_hash(log_rounds)
+        password_ok = bcrypt.check_password_hash(password_hash, password)
 
-        if not user:
+        if not user or not password_ok:
             flash('Invalid username or password.', 'danger')
             return render_template('login.html')
 
@@ -47,10 +67,10 @@ def login():
             flash('Your account has been deactivated. Please contact the administrator.', 'danger')
             return render_template('login.html')
 
-        # Verify password
-        if not bcrypt.check_password_hash(user.password_hash, password):
-            flash('Invalid username or password.', 'danger')
-            return render_template('login.html')
+        # Upgrade the stored hash if the configured work factor has changed
+        if user.password_needs_rehash(log_rounds):
+            user.password_hash = bcrypt.generate_password_hash(password, log_rounds).decode('utf-8')
+            db.session.commit()
 
         # Login successful
         login_user(user, remember=remember)
@@ -61,14 +81,7 @@ def login():
         if next_page:
             return redirect(next_page)
 
-        if user.role == 'admin':
-            return redirect(url_for('admin.dashboard'))
-        elif user.role == 'doctor':
-            return redirect(url_for('doctor.dashboard'))
-        elif user.role == 'patient':
-            return redirect(url_for('patient.dashboard'))
-        else:
-            return redirect(url_for('index'))
+        return redirect(dashboard_url_for(user.role))
 
     # GET request - show login form
     return render_template('login.html')
@@ -144,12 +157,14 @@ def register():
         if contact_number and not validate_phone(contact_number):
             errors.append('Please enter a valid 10-digit phone number.')
 
-        # Check if username already exists
-        if User.query.filter_by(username=username).first():
-            errors.append('Username already exists. Please choose another.')
+        # Start hashing in the background while the uniqueness check runs
+        hash_future = None if errors else HASH_EXECUTOR.submit(bcrypt.generate_password_hash, password)
 
-        # Check if email already exists
-        if User.query.filter_by(email=email).first():
+        # Check if username or email already exists
+        username_taken, email_taken = User.find_conflicts(username=username, email=email)
+        if username_taken:
+            errors.append('Username already exists. Please choose another.')
+        if email_taken:
             errors.append('Email already registered. Please use another or login.')
 
         # Gender validation
@@ -168,8 +183,8 @@ def register():
 
         # Create user and patient
         try:
-            # Hash password
-            password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+            # Collect the password hash started above
+            password_hash = hash_future.result().decode('utf-8')
 
             # Create user
             user = User(
@@ -178,34 +193,42 @@ def register():
                 password_hash=password_hash,
                 role='patient'
             )
-            db.session.add(user)
-            db.session.flush()  # Get user.id
 
             # Parse date of birth
-            dob = None
-            if date_of_birth:
-                try:
-                    dob = datetime.strptime(date_of_birth, '%Y-%m-%d').date()
-                except:
-                    pass
-
-            # Create patient profile
+            dob = parse_date(date_of_birth)
+
+            # Create patient profile, linked through the relationship so both
+            # rows are inserted in the single flush at commit
             patient = Patient(
-                user_id=user.id,
                 name=name,
                 contact_number=contact_number,
                 date_of_birth=dob,
                 gender=gender if gender else None,
                 address=address if address else None,
                 blood_group=blood_group if blood_group else None,
-                emergency_contact=emergency_contact if emergency_contact else None
+                emergency_contact=emergency_contact if emergency_contact else None,
+                user=user
             )
             db.session.add(patient)
             db.session.commit()
+            clear_stats_cache()
 
             flash(f'Registration successful! Welcome, {name}. Please login to continue.', 'success')
             return redirect(url_for('auth.login'))
 
+        except IntegrityError as e:
+            # Lost a race with a concurrent registration: the unique indexes
+            # on users.username/users.email are the final arbiter
+            db.session.rollback()
+            username_taken, email_taken = User.find_integrity_conflicts(e, username, email)
+            if username_taken:
+                flash('Username already exists. Please choose another.', 'danger')
+            if email_taken:
+                flash('Email already registered. Please use another or login.', 'danger')
+            if not (username_taken or email_taken):
+                flash('Registration failed: duplicate record. Please try again.', 'danger')
+            return render_template('register.html', form_data=request.form)
+
         except Exception as e:
             db.session.rollback()
             flash(f'Registration failed: {str(e)}. Please try again.', 'danger')
@@ -243,11 +266,6 @@ def change_password():
             flash('All fields are required.', 'danger')
             return render_template('change_password.html')
 
-        # Verify current password
-        if not bcrypt.check_password_hash(current_user.password_hash, current_password):
-            flash('Current password is incorrect.', 'danger')
-            return render_template('change_password.html')
-
         # Validate new password
         if len(new_password) < 6:
             flash('New password must be at least 6 characters long.', 'danger')
@@ -257,6 +275,12 @@ def change_password():
             flash('New passwords do not match.', 'danger')
             return render_template('change_password.html')
 
+        # Verify current password (before any hashing work, so failed
+        # attempts cost a single bcrypt check)
+        if not bcrypt.check_password_hash(current_user.password_hash, current_password):
+            flash('Current password is incorrect.', 'danger')
+            return render_template('change_password.html')
+
         # Update password
         try:
             current_user.password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
@@ -264,12 +288,7 @@ def change_password():
             flash('Password changed successfully!', 'success')
 
             # Redirect based on role
-            if current_user.role == 'admin':
-                return redirect(url_for('admin.dashboard'))
-            elif current_user.role == 'doctor':
-                return redirect(url_for('doctor.dashboard'))
-            elif current_user.role == 'patient':
-                return redirect(url_for('patient.dashboard'))
+            return redirect(dashboard_url_for(current_user.role))
 
         except Exception as e:
             db.session.rollback()
@@ -281,13 +300,36 @@ def change_password():
 
 # ==================== LEGAL & HELP PAGES ====================
 
+@cache.memoize(timeout=3600)
+def _render_public_page(template_name):
+    """Render a static page as an anonymous visitor sees it (cached)"""
+    return render_template(template_name)
+
+
+def _public_page(template_name):
+    """
+    Serve a static legal/help page
+    The anonymous render is cached (the navbar depends on the user, and
+    pending flash messages are rendered into the page, so those requests
+    render normally). An ETag lets browsers revalidate with a 304.
+    """
+    if current_user.is_authenticated or '_flashes' in session:
+        html = render_template(template_name)
+    else:
+        html = _render_public_page(template_name)
+
+    response = make_response(html)
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 @auth_bp.route('/privacy-policy')
 def privacy_policy():
     """
     Privacy Policy page
     Public access - explains data collection and usage
     """
-    return render_template('privacy_policy.html')
+    return _public_page('privacy_policy.html')
 
 
 @auth_bp.route('/terms-of-service')
@@ -296,7 +338,7 @@ def terms_of_service():
     Terms of Service page
     Public access - user agreement and policies
     """
-    return render_template('terms_of_service.html')
+    return _public_page('terms_of_service.html')
 
 
 @auth_bp.route('/faq')
@@ -305,4 +347,4 @@ def faq():
     Frequently Asked Questions page
     Public access - help and common questions
     """
-    return render_template('faq.html')
+    return _public_page('faq.html')
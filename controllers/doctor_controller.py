@@ -3,15 +3,18 @@ Doctor Controller
 Handles doctor dashboard, appointments, treatments, and availability management
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload, load_only
 from extensions import db
-from models.doctor import Doctor, DoctorAvailability
+from models.doctor import DoctorAvailability
 from models.patient import Patient
 from models.appointment import Appointment
 from models.treatment import Treatment
 from utils.decorators import doctor_required
 from utils.helpers import parse_date, parse_time, get_next_n_days, format_date
+from utils.database import clear_stats_cache, clear_availability_cache, paginate
 from datetime import date, time, datetime, timedelta
 
 # Create blueprint
@@ -26,7 +29,7 @@ def dashboard():
     Shows upcoming appointments, today's schedule, patient count
     """
     # Get doctor profile
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
     if not doctor:
         flash('Doctor profile not found. Please contact administrator.', 'danger')
@@ -36,20 +39,12 @@ def dashboard():
     today = date.today()
     todays_appointments_list = Appointment.get_today_appointments(doctor_id=doctor.id)
 
-    # Get upcoming appointments (next 7 days)
-    upcoming_appointments_list = Appointment.get_upcoming_appointments(days=7, doctor_id=doctor.id)
-
-    # Get recent completed appointments
-    completed_appointments_list = Appointment.query.filter_by(
-        doctor_id=doctor.id,
-        status='Completed'
-    ).order_by(Appointment.appointment_date.desc()).limit(10).all()
-
-    # Statistics for stat cards
+    # Statistics for stat cards (one aggregate query)
+    stats = doctor.get_appointment_stats(days=7)
     today_appointments = len(todays_appointments_list)  # Count for today
-    total_patients = len(set(apt.patient_id for apt in Appointment.query.filter_by(doctor_id=doctor.id).all()))  # Unique patients
-    completed_appointments = Appointment.query.filter_by(doctor_id=doctor.id, status='Completed').count()
-    upcoming_appointments = len(upcoming_appointments_list)
+    total_patients = stats['total_patients']  # Unique patients
+    completed_appointments = stats['completed_appointments']
+    upcoming_appointments = stats['upcoming_appointments']  # Next 7 days
 
     # Format current date
     current_date = today.strftime('%d %b %Y')
@@ -72,7 +67,7 @@ def view_appointments():
     """
     View all appointments with filters
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
     if not doctor:
         flash('Doctor profile not found.', 'danger')
@@ -82,27 +77,33 @@ def view_appointments():
     status_filter = request.args.get('status', '')
     date_filter = request.args.get('date', '')
 
-    query = Appointment.query.filter_by(doctor_id=doctor.id)
+    # Only the columns the list renders; cancellation_reason (TEXT) and the
+    # timestamps stay on disk
+    query = Appointment.query.options(
+        load_only(Appointment.id, Appointment.patient_id, Appointment.appointment_date,
+                  Appointment.appointment_time, Appointment.status),
+        joinedload(Appointment.patient)
+    ).filter_by(doctor_id=doctor.id)
 
     # Apply filters
     if status_filter and status_filter in ['Booked', 'Completed', 'Cancelled']:
         query = query.filter_by(status=status_filter)
 
     if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
+        filter_date = parse_date(date_filter)
+        if filter_date:
             query = query.filter_by(appointment_date=filter_date)
-        except:
-            pass
 
-    appointments = query.order_by(
+    page = request.args.get('page', 1, type=int)
+    pagination = paginate(query.order_by(
         Appointment.appointment_date.desc(),
         Appointment.appointment_time.desc()
-    ).all()
+    ), page, current_app.config['ITEMS_PER_PAGE'])
 
     return render_template('doctor/appointments.html',
                          doctor=doctor,
-                         appointments=appointments,
+                         appointments=pagination.items,
+                         pagination=pagination,
                          status_filter=status_filter,
                          date_filter=date_filter)
 
@@ -113,8 +114,8 @@ def view_appointment(appointment_id):
     """
     View appointment details
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
-    appointment = Appointment.query.get_or_404(appointment_id)
+    doctor = current_user.doctor
+    appointment = db.get_or_404(Appointment, appointment_id)
 
     # Verify this appointment belongs to the doctor
     if appointment.doctor_id != doctor.id:
@@ -132,8 +133,8 @@ def complete_appointment(appointment_id):
     """
     Mark appointment as completed and add treatment record
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
-    appointment = Appointment.query.get_or_404(appointment_id)
+    doctor = current_user.doctor
+    appointment = db.get_or_404(Appointment, appointment_id)
 
     # Verify this appointment belongs to the doctor
     if appointment.doctor_id != doctor.id:
@@ -167,6 +168,7 @@ def complete_appointment(appointment_id):
             )
 
             if success:
+                clear_stats_cache()
                 flash('Appointment completed and treatment record created successfully!', 'success')
                 return redirect(url_for('doctor.view_appointments'))
             else:
@@ -187,28 +189,39 @@ def cancel_appointment(appointment_id):
     """
     Cancel an appointment
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
-    appointment = Appointment.query.get_or_404(appointment_id)
-
-    # Verify this appointment belongs to the doctor
-    if appointment.doctor_id != doctor.id:
-        flash('You do not have permission to modify this appointment.', 'danger')
-        return redirect(url_for('doctor.view_appointments'))
-
-    # Check if appointment can be cancelled
-    if not appointment.can_be_cancelled():
-        flash(f'This appointment cannot be cancelled. Current status: {appointment.status}', 'warning')
-        return redirect(url_for('doctor.view_appointment', appointment_id=appointment_id))
-
+    doctor_id = current_user.doctor.id
     reason = request.form.get('reason', 'Cancelled by doctor')
 
     try:
-        appointment.mark_cancelled(reason=reason)
-        flash('Appointment cancelled successfully.', 'info')
+        # Ownership and status checks are part of the UPDATE itself
+        updated = Appointment.query.filter(
+            Appointment.id == appointment_id,
+            Appointment.doctor_id == doctor_id,
+            Appointment.status == 'Booked'
+        ).update({
+            Appointment.status: 'Cancelled',
+            Appointment.cancellation_reason: reason,
+            Appointment.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
 
     except Exception as e:
+        db.session.rollback()
         flash(f'Error cancelling appointment: {str(e)}', 'danger')
+        return redirect(url_for('doctor.view_appointments'))
+
+    if not updated:
+        # Nothing matched: load the row only now to explain why
+        appointment = db.get_or_404(Appointment, appointment_id)
+        if appointment.doctor_id != doctor_id:
+            flash('You do not have permission to modify this appointment.', 'danger')
+            return redirect(url_for('doctor.view_appointments'))
 
+        flash(f'This appointment cannot be cancelled. Current status: {appointment.status}', 'warning')
+        return redirect(url_for('doctor.view_appointment', appointment_id=appointment_id))
+
+    clear_stats_cache()
+    flash('Appointment cancelled successfully.', 'info')
     return redirect(url_for('doctor.view_appointments'))
 
 
@@ -220,23 +233,23 @@ def view_patients():
     """
     View all patients who have appointments with this doctor
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
-    # Get unique patients from appointments
-    patients_query = db.session.query(Patient).join(Appointment).filter(
+    # Get unique patients with their appointment count in one grouped query
+    rows = db.session.query(Patient, func.count(Appointment.id).label('appointment_count')).join(
+        Appointment, Appointment.patient_id == Patient.id
+    ).filter(
         Appointment.doctor_id == doctor.id
-    ).distinct().order_by(Patient.name).all()
+    ).group_by(Patient.id).order_by(Patient.name).all()
 
-    # Calculate appointment count for each patient with this doctor
-    for patient in patients_query:
-        patient.appointment_count = Appointment.query.filter_by(
-            patient_id=patient.id,
-            doctor_id=doctor.id
-        ).count()
+    patients = []
+    for patient, appointment_count in rows:
+        patient.appointment_count = appointment_count
+        patients.append(patient)
 
     return render_template('doctor/patients.html',
                          doctor=doctor,
-                         patients=patients_query)
+                         patients=patients)
 
 
 @doctor_bp.route('/patients/<int:patient_id>/history')
@@ -245,32 +258,34 @@ def patient_history(patient_id):
     """
     View patient's complete medical history with this doctor
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
-    patient = Patient.query.get_or_404(patient_id)
-
-    # Get all appointments between this patient and doctor
-    appointments = Appointment.query.filter_by(
+    doctor = current_user.doctor
+    patient = db.get_or_404(Patient, patient_id)
+
+    # Get one page of appointments between this patient and doctor
+    page = request.args.get('page', 1, type=int)
+    pagination = paginate(Appointment.query.options(
+        selectinload(Appointment.treatment)
+    ).filter_by(
         patient_id=patient_id,
         doctor_id=doctor.id
-    ).order_by(Appointment.appointment_date.desc()).all()
-
-    # Get treatment records
-    treatments = []
-    for appointment in appointments:
-        if appointment.treatment:
-            treatments.append({
-                'appointment': appointment,
-                'treatment': appointment.treatment
-            })
+    ).order_by(
+        Appointment.appointment_date.desc(),
+        Appointment.appointment_time.desc()
+    ), page, current_app.config['ITEMS_PER_PAGE'])
 
-    # Count completed treatments
-    completed_count = len(treatments)
+    # Count completed treatments across the whole history, not just this page
+    completed_count = db.session.query(func.count(Treatment.id)).join(
+        Appointment, Treatment.appointment_id == Appointment.id
+    ).filter(
+        Appointment.patient_id == patient_id,
+        Appointment.doctor_id == doctor.id
+    ).scalar()
 
     return render_template('doctor/patient_history.html',
                          doctor=doctor,
                          patient=patient,
-                         appointments=appointments,
-                         treatments=treatments,
+                         appointments=pagination.items,
+                         pagination=pagination,
                          completed_count=completed_count)
 
 
@@ -282,7 +297,7 @@ def manage_availability():
     """
     View and manage doctor's availability for next 7 days
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
     # Get current availability (let template handle grouping)
     availabilities = doctor.get_availability_for_next_7_days()
@@ -302,7 +317,7 @@ def add_availability():
     """
     Add availability slot
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
     if request.method == 'POST':
         available_date_str = request.form.get('available_date', '')
@@ -354,12 +369,14 @@ def add_availability():
 
         # Add availability
         try:
+            doctor_id = doctor.id
             DoctorAvailability.set_doctor_availability(
-                doctor_id=doctor.id,
+                doctor_id=doctor_id,
                 available_date=available_date,
                 start_time=start_time,
                 end_time=end_time
             )
+            clear_availability_cache(doctor_id)
 
             flash('Availability added successfully!', 'success')
             return redirect(url_for('doctor.manage_availability'))
@@ -380,23 +397,29 @@ def delete_availability(availability_id):
     """
     Delete availability slot
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
-    availability = DoctorAvailability.query.get_or_404(availability_id)
-
-    # Verify this availability belongs to the doctor
-    if availability.doctor_id != doctor.id:
-        flash('You do not have permission to delete this availability.', 'danger')
-        return redirect(url_for('doctor.manage_availability'))
+    doctor_id = current_user.doctor.id
 
     try:
-        db.session.delete(availability)
+        # Ownership check is part of the DELETE itself
+        deleted = DoctorAvailability.query.filter_by(
+            id=availability_id,
+            doctor_id=doctor_id
+        ).delete(synchronize_session=False)
         db.session.commit()
-        flash('Availability slot deleted successfully.', 'success')
 
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting availability: {str(e)}', 'danger')
+        return redirect(url_for('doctor.manage_availability'))
+
+    if not deleted:
+        # Nothing matched: 404 if the slot is missing, otherwise it is not ours
+        db.get_or_404(DoctorAvailability, availability_id)
+        flash('You do not have permission to delete this availability.', 'danger')
+        return redirect(url_for('doctor.manage_availability'))
 
+    clear_availability_cache(doctor_id)
+    flash('Availability slot deleted successfully.', 'success')
     return redirect(url_for('doctor.manage_availability'))
 
 
@@ -408,15 +431,13 @@ def profile():
     """
     View doctor's own profile
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
-    # Calculate statistics for profile page
-    total_patients = len(set(apt.patient_id for apt in Appointment.query.filter_by(doctor_id=doctor.id).all()))
-    completed_appointments = Appointment.query.filter_by(doctor_id=doctor.id, status='Completed').count()
-    upcoming_appointments = Appointment.query.filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.status == 'Booked'
-    ).count()
+    # Calculate statistics for profile page (one aggregate query)
+    stats = doctor.get_appointment_stats()
+    total_patients = stats['total_patients']
+    completed_appointments = stats['completed_appointments']
+    upcoming_appointments = stats['booked_appointments']
 
     return render_template('doctor/profile.html',
                          doctor=doctor,
@@ -431,7 +452,7 @@ def edit_profile():
     """
     Edit doctor's own profile (limited fields)
     """
-    doctor = Doctor.get_by_user_id(current_user.id)
+    doctor = current_user.doctor
 
     if request.method == 'POST':
         qualification = request.form.get('qualification', '').strip()
@@ -5,6 +5,7 @@ Handles patient dashboard, doctor search, appointment booking, and treatment his
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import current_user
+from sqlalchemy.orm import contains_eager
 from extensions import db
 from models.patient import Patient
 from models.doctor import Doctor
@@ -12,7 +13,8 @@ from models.specialization import Specialization
 from models.appointment import Appointment
 from models.treatment import Treatment
 from utils.decorators import patient_required
-from utils.helpers import parse_date, parse_time, get_next_n_days, format_date, validate_phone
+from utils.helpers import parse_date, parse_time, get_next_n_days, validate_phone
+from utils.database import clear_stats_cache, get_specialization_summaries, get_availability_json
 from datetime import date, time, datetime
 
 # Create blueprint
@@ -27,31 +29,28 @@ def dashboard():
     Shows available specializations, upcoming appointments, and quick actions
     """
     # Get patient profile
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     if not patient:
         flash('Patient profile not found. Please contact administrator.', 'danger')
         return redirect(url_for('auth.logout'))
 
     # Get all specializations
-    specializations = Specialization.get_all_specializations()
+    specializations = get_specialization_summaries()
 
     # Get upcoming appointments
-    upcoming_appointments = patient.upcoming_appointments[:5]  # Next 5
+    upcoming_appointments = patient.get_upcoming_appointments(limit=5)  # Next 5
 
-    # Get recent past appointments
-    past_appointments = patient.past_appointments[:5]  # Last 5
-
-    # Statistics
-    total_appointments = patient.total_appointments
-    total_upcoming = len(patient.upcoming_appointments)
-    completed_appointments = len(patient.past_appointments)
+    # Statistics (one aggregate query)
+    stats = patient.get_appointment_stats()
+    total_appointments = stats['total_appointments']
+    total_upcoming = stats['upcoming_appointments']
+    completed_appointments = stats['past_appointments']
 
     return render_template('patient/dashboard.html',
                          patient=patient,
                          specializations=specializations,
                          upcoming_appointments=upcoming_appointments,
-                         past_appointments=past_appointments,
                          total_appointments=total_appointments,
                          total_upcoming=total_upcoming,
                          completed_appointments=completed_appointments)
@@ -65,14 +64,14 @@ def search_doctors():
     """
     Search and browse doctors by specialization or name
     """
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     # Get filters
     specialization_id = request.args.get('specialization', '')
     search_query = request.args.get('search', '').strip()
 
     # Get all specializations for filter dropdown
-    specializations = Specialization.get_all_specializations()
+    specializations = get_specialization_summaries()
 
     # Build query
     if specialization_id:
@@ -96,24 +95,16 @@ def view_doctor(doctor_id):
     """
     View doctor profile and availability
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    doctor = Doctor.query.get_or_404(doctor_id)
-
-    # Get doctor's availability for next 7 days
-    availability = doctor.get_availability_for_next_7_days()
+    patient = current_user.patient
+    doctor = db.get_or_404(Doctor, doctor_id)
 
-    # Group availability by date
-    availability_by_date = {}
-    for slot in availability:
-        date_str = format_date(slot.available_date)
-        if date_str not in availability_by_date:
-            availability_by_date[date_str] = []
-        availability_by_date[date_str].append(slot)
+    # Get doctor's availability for next 7 days (ordered by date, time)
+    available_slots = doctor.get_availability_for_next_7_days()
 
     return render_template('patient/view_doctor.html',
                          patient=patient,
                          doctor=doctor,
-                         availability_by_date=availability_by_date)
+                         available_slots=available_slots)
 
 
 # ==================== APPOINTMENT BOOKING ====================
@@ -124,8 +115,8 @@ def book_appointment(doctor_id):
     """
     Book an appointment with a doctor
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    doctor = Doctor.query.get_or_404(doctor_id)
+    patient = current_user.patient
+    doctor = db.get_or_404(Doctor, doctor_id)
 
     if request.method == 'POST':
         appointment_date_str = request.form.get('appointment_date', '')
@@ -161,19 +152,10 @@ def book_appointment(doctor_id):
             for error in errors:
                 flash(error, 'danger')
 
-            # Get availability for form
-            availability = doctor.get_availability_for_next_7_days()
-            availability_by_date = {}
-            for slot in availability:
-                date_str = format_date(slot.available_date)
-                if date_str not in availability_by_date:
-                    availability_by_date[date_str] = []
-                availability_by_date[date_str].append(slot)
-
             return render_template('patient/book_appointment.html',
                                  patient=patient,
                                  doctor=doctor,
-                                 availability_by_date=availability_by_date,
+                                 availability_json=get_availability_json(doctor.id, date.today()),
                                  form_data=request.form)
 
         # Book appointment with double-booking check
@@ -186,57 +168,29 @@ def book_appointment(doctor_id):
             )
 
             if success:
+                clear_stats_cache()
                 flash('Appointment booked successfully!', 'success')
                 return redirect(url_for('patient.my_appointments'))
             else:
                 flash(f'Error: {message}', 'danger')
 
-                # Get availability for form
-                availability = doctor.get_availability_for_next_7_days()
-                availability_by_date = {}
-                for slot in availability:
-                    date_str = format_date(slot.available_date)
-                    if date_str not in availability_by_date:
-                        availability_by_date[date_str] = []
-                    availability_by_date[date_str].append(slot)
-
                 return render_template('patient/book_appointment.html',
                                      patient=patient,
                                      doctor=doctor,
-                                     availability_by_date=availability_by_date,
+                                     availability_json=get_availability_json(doctor.id, date.today()),
                                      form_data=request.form)
 
         except Exception as e:
             flash(f'Error booking appointment: {str(e)}', 'danger')
 
     # GET request - show booking form
-    # Get doctor's availability
-    availability = doctor.get_availability_for_next_7_days()
-
-    # Group availability by date and convert to JSON-friendly format
-    availability_by_date = {}
-    availability_json = {}
-
-    for slot in availability:
-        # For display in template
-        date_str = format_date(slot.available_date)
-        if date_str not in availability_by_date:
-            availability_by_date[date_str] = []
-        availability_by_date[date_str].append(slot)
-
-        # For JavaScript (use ISO format YYYY-MM-DD)
-        date_iso = slot.available_date.isoformat()
-        if date_iso not in availability_json:
-            availability_json[date_iso] = []
-        availability_json[date_iso].append({
-            'start_time': slot.start_time.strftime('%H:%M'),
-            'end_time': slot.end_time.strftime('%H:%M')
-        })
+    # Slots grouped by ISO date (YYYY-MM-DD) for the JavaScript slot picker;
+    # cached per doctor and day, so error re-renders skip the query
+    availability_json = get_availability_json(doctor.id, date.today())
 
     return render_template('patient/book_appointment.html',
                          patient=patient,
                          doctor=doctor,
-                         availability_by_date=availability_by_date,
                          availability_json=availability_json)
 
 
@@ -248,7 +202,7 @@ def my_appointments():
     """
     View all patient's appointments
     """
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     # Get filter
     status_filter = request.args.get('status', '')
@@ -270,13 +224,12 @@ def view_appointment(appointment_id):
     """
     View appointment details
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    appointment = Appointment.query.get_or_404(appointment_id)
-
-    # Verify this appointment belongs to the patient
-    if appointment.patient_id != patient.id:
-        flash('You do not have permission to view this appointment.', 'danger')
-        return redirect(url_for('patient.my_appointments'))
+    patient = current_user.patient
+    # Ownership is part of the lookup; other patients' appointments 404
+    appointment = Appointment.query.filter_by(
+        id=appointment_id,
+        patient_id=patient.id
+    ).first_or_404()
 
     return render_template('patient/view_appointment.html',
                          patient=patient,
@@ -289,13 +242,12 @@ def cancel_appointment(appointment_id):
     """
     Cancel an appointment
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    appointment = Appointment.query.get_or_404(appointment_id)
-
-    # Verify this appointment belongs to the patient
-    if appointment.patient_id != patient.id:
-        flash('You do not have permission to cancel this appointment.', 'danger')
-        return redirect(url_for('patient.my_appointments'))
+    patient = current_user.patient
+    # Ownership is part of the lookup; other patients' appointments 404
+    appointment = Appointment.query.filter_by(
+        id=appointment_id,
+        patient_id=patient.id
+    ).first_or_404()
 
     # Check if appointment can be cancelled
     if not appointment.can_be_cancelled():
@@ -306,9 +258,12 @@ def cancel_appointment(appointment_id):
 
     try:
         appointment.mark_cancelled(reason=reason)
+        db.session.commit()
+        clear_stats_cache()
         flash('Appointment cancelled successfully.', 'info')
 
     except Exception as e:
+        db.session.rollback()
         flash(f'Error cancelling appointment: {str(e)}', 'danger')
 
     return redirect(url_for('patient.my_appointments'))
@@ -322,15 +277,23 @@ def treatment_history():
     """
     View complete treatment history
     """
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     # Get treatment history
     treatments = patient.get_treatment_history()
 
-    # Calculate statistics
+    # Calculate statistics (one pass over the already-loaded rows; an empty
+    # history needs no special case)
+    doctor_ids = set()
+    specialization_ids = set()
+    for treatment in treatments:
+        doctor = treatment.appointment.doctor
+        doctor_ids.add(doctor.id)
+        specialization_ids.add(doctor.specialization_id)
+
     total_treatments = len(treatments)
-    unique_doctors = len(set(t.appointment.doctor_id for t in treatments)) if treatments else 0
-    unique_specializations = len(set(t.appointment.doctor.specialization_id for t in treatments)) if treatments else 0
+    unique_doctors = len(doctor_ids)
+    unique_specializations = len(specialization_ids)
 
     return render_template('patient/treatment_history.html',
                          patient=patient,
@@ -346,13 +309,14 @@ def view_treatment(treatment_id):
     """
     View detailed treatment record
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    treatment = Treatment.query.get_or_404(treatment_id)
-
-    # Verify this treatment belongs to the patient
-    if treatment.appointment.patient_id != patient.id:
-        flash('You do not have permission to view this treatment record.', 'danger')
-        return redirect(url_for('patient.treatment_history'))
+    patient = current_user.patient
+    # Ownership is part of the lookup; other patients' records 404
+    treatment = Treatment.query.join(Treatment.appointment).options(
+        contains_eager(Treatment.appointment)
+    ).filter(
+        Treatment.id == treatment_id,
+        Appointment.patient_id == patient.id
+    ).first_or_404()
 
     return render_template('patient/view_treatment.html',
                          patient=patient,
@@ -368,7 +332,7 @@ def profile():
     """
     View patient's own profile
     """
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     return render_template('patient/profile.html', patient=patient)
 
@@ -379,7 +343,7 @@ def edit_profile():
     """
     Edit patient's own profile
     """
-    patient = Patient.get_by_user_id(current_user.id)
+    patient = current_user.patient
 
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
@@ -439,8 +403,8 @@ def view_specializations():
     """
     View all available specializations
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    specializations = Specialization.get_all_specializations()
+    patient = current_user.patient
+    specializations = get_specialization_summaries()
 
     return render_template('patient/specializations.html',
                          patient=patient,
@@ -453,8 +417,8 @@ def doctors_by_specialization(specialization_id):
     """
     View all doctors in a specific specialization
     """
-    patient = Patient.get_by_user_id(current_user.id)
-    specialization = Specialization.query.get_or_404(specialization_id)
+    patient = current_user.patient
+    specialization = db.get_or_404(Specialization, specialization_id)
     doctors = Doctor.get_by_specialization(specialization_id)
 
     return render_template('patient/doctors_by_specialization.html',
@@ -4,12 +4,48 @@ Centralized location for all Flask extension instances
 This avoids circular imports when using the application factory pattern
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import g, has_request_context
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from flask_caching import Cache
 
 # Initialize Flask extensions
 # These will be initialized with the app in app.py using init_app()
 db = SQLAlchemy()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
+cache = Cache()
+
+# Worker pool for password hashing (bcrypt releases the GIL), so request
+# handlers can overlap the hash with their database checks
+HASH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='bcrypt')
+
+
+def request_cached(f):
+    """
+    Memoize a function for the duration of the current request
+    Results live on flask.g, so repeated lookups within one request share a
+    single query and nothing leaks across requests. None results are not
+    stored, so a lookup that missed runs again after a create in the same
+    request. Outside a request the function is called directly.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not has_request_context():
+            return f(*args, **kwargs)
+
+        request_cache = g.setdefault('request_cache', {})
+        key = (f.__qualname__, args, tuple(sorted(kwargs.items())))
+        result = request_cache.get(key)
+        if result is None:
+            result = f(*args, **kwargs)
+            if result is not None:
+                request_cache[key] = result
+        return result
+
+    return decorated_function
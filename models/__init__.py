@@ -12,6 +12,16 @@ from models.specialization import Specialization
 from models.appointment import Appointment
 from models.treatment import Treatment
 
+from sqlalchemy import DDL, event
+from extensions import db
+
+# The trigram search indexes need pg_trgm; create it ahead of the tables
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
 __all__ = [
     'User',
     'Admin',
@@ -4,6 +4,9 @@ Represents scheduled appointments between patients and doctors
 """
 
 from datetime import datetime, date
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
 from extensions import db
 
 
@@ -15,11 +18,14 @@ class Appointment(db.Model):
 
     __tablename__ = 'appointments'
 
+    # Rows fetched per round-trip by get_all_appointments(stream=True)
+    STREAM_BATCH_SIZE = 500
+
     # Primary Key
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
     # Foreign Keys
-    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False, index=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False, index=True)
 
     # Appointment details
@@ -39,9 +45,20 @@ class Appointment(db.Model):
     # Relationships
     treatment = db.relationship('Treatment', backref='appointment', uselist=False, cascade='all, delete-orphan')
 
-    # Composite index and unique constraint for preventing double-booking
+    # Composite index and unique constraint for preventing double-booking.
+    # The unique index is partial (Booked rows only) so a cancelled slot can
+    # be booked again; it closes the check-then-insert race in create_appointment
     __table_args__ = (
         db.Index('idx_doctor_date_time', 'doctor_id', 'appointment_date', 'appointment_time'),
+        # Patient appointment lists: filter by patient (+ status), order by date
+        db.Index('idx_patient_status_date', 'patient_id', 'status', 'appointment_date'),
+        # Past appointments before today (first branch of get_past_appointments);
+        # also serves patient_id-only lookups, so patient_id has no index of its own
+        db.Index('idx_patient_date', 'patient_id', 'appointment_date'),
+        db.Index('uq_appointments_doctor_slot_booked', 'doctor_id', 'appointment_date', 'appointment_time',
+                 unique=True,
+                 postgresql_where=(status == 'Booked'),
+                 sqlite_where=(status == 'Booked')),
     )
 
     def __init__(self, patient_id, doctor_id, appointment_date, appointment_time, status='Booked'):
@@ -56,30 +73,40 @@ class Appointment(db.Model):
         """String representation of Appointment"""
         return f'<Appointment {self.id} - Patient:{self.patient_id} Doctor:{self.doctor_id} {self.status}>'
 
-    @property
+    @hybrid_property
     def is_upcoming(self):
         """Check if appointment is in the future"""
         today = date.today()
         return self.appointment_date >= today and self.status == 'Booked'
 
-    @property
+    @is_upcoming.expression
+    def is_upcoming(cls):
+        """SQL form of is_upcoming, usable in filter()/order_by()/case()"""
+        # Bind today's date from Python so SQL and instance checks agree
+        return and_(cls.appointment_date >= date.today(), cls.status == 'Booked')
+
+    @hybrid_property
     def is_past(self):
         """Check if appointment is in the past"""
         today = date.today()
         return self.appointment_date < today or self.status in ['Completed', 'Cancelled']
 
+    @is_past.expression
+    def is_past(cls):
+        """SQL form of is_past, usable in filter()/order_by()/case()"""
+        return or_(cls.appointment_date < date.today(),
+                   cls.status.in_(['Completed', 'Cancelled']))
+
     def mark_completed(self):
-        """Mark appointment as completed"""
+        """Mark appointment as completed (caller commits)"""
         self.status = 'Completed'
         self.updated_at = datetime.utcnow()
-        db.session.commit()
 
     def mark_cancelled(self, reason=None):
-        """Mark appointment as cancelled"""
+        """Mark appointment as cancelled (caller commits)"""
         self.status = 'Cancelled'
         self.cancellation_reason = reason
         self.updated_at = datetime.utcnow()
-        db.session.commit()
 
     def can_be_cancelled(self):
         """Check if appointment can be cancelled"""
@@ -101,7 +128,7 @@ class Appointment(db.Model):
             'doctor_name': self.doctor.name if self.doctor else None,
             'specialization': self.doctor.specialization.name if self.doctor and self.doctor.specialization else None,
             'appointment_date': self.appointment_date.isoformat() if self.appointment_date else None,
-            'appointment_time': self.appointment_time.strftime('%H:%M') if self.appointment_time else None,
+            'appointment_time': self.appointment_time.isoformat(timespec='minutes') if self.appointment_time else None,
             'status': self.status,
             'booking_date': self.booking_date.isoformat() if self.booking_date else None,
             'cancellation_reason': self.cancellation_reason
@@ -133,14 +160,21 @@ class Appointment(db.Model):
         Create a new appointment with double-booking check
         Returns (success: bool, message: str, appointment: Appointment or None)
         """
+        from models.doctor import Doctor
+
+        # Lock the doctor row (SELECT ... FOR UPDATE) so concurrent bookings
+        # for the same doctor run the checks below one at a time; bookings
+        # for other doctors are not blocked. No-op on SQLite.
+        doctor = Doctor.query.filter_by(id=doctor_id).with_for_update().first()
+
         # Check for double-booking
         if not Appointment.check_double_booking(doctor_id, appointment_date, appointment_time):
+            db.session.rollback()  # Release the lock
             return False, "Doctor is not available at this time. Please choose another time slot.", None
 
         # Check if doctor has availability set for this date/time
-        from models.doctor import Doctor
-        doctor = Doctor.query.get(doctor_id)
         if doctor and not doctor.is_available_on(appointment_date, appointment_time):
+            db.session.rollback()  # Release the lock
             return False, "Doctor is not available on this date/time. Please check availability.", None
 
         # Create appointment
@@ -155,14 +189,43 @@ class Appointment(db.Model):
             db.session.commit()
             return True, "Appointment booked successfully!", appointment
 
+        except IntegrityError:
+            # A concurrent booking took the slot after the check above
+            db.session.rollback()
+            return False, "Doctor is not available at this time. Please choose another time slot.", None
+
         except Exception as e:
             db.session.rollback()
             return False, f"Error creating appointment: {str(e)}", None
 
+    @staticmethod
+    def detail_options(include_treatment=False):
+        """
+        Loader options for listing appointments with the fields to_dict() reads
+
+        Args:
+            include_treatment: Also load the treatment (to_dict(include_treatment=True))
+
+        Returns:
+            List of loader options for Query.options()
+        """
+        from sqlalchemy.orm import joinedload, selectinload
+        from models.doctor import Doctor
+
+        options = [
+            joinedload(Appointment.patient),
+            joinedload(Appointment.doctor).joinedload(Doctor.specialization),
+        ]
+        if include_treatment:
+            options.append(selectinload(Appointment.treatment))
+        return options
+
     @staticmethod
     def get_appointments_by_doctor(doctor_id, status=None, from_date=None):
         """Get appointments for a specific doctor"""
-        query = Appointment.query.filter_by(doctor_id=doctor_id)
+        query = Appointment.query.options(
+            *Appointment.detail_options()
+        ).filter_by(doctor_id=doctor_id)
 
         if status:
             query = query.filter_by(status=status)
@@ -175,7 +238,9 @@ class Appointment(db.Model):
     @staticmethod
     def get_appointments_by_patient(patient_id, status=None):
         """Get appointments for a specific patient"""
-        query = Appointment.query.filter_by(patient_id=patient_id)
+        query = Appointment.query.options(
+            *Appointment.detail_options()
+        ).filter_by(patient_id=patient_id)
 
         if status:
             query = query.filter_by(status=status)
@@ -183,9 +248,22 @@ class Appointment(db.Model):
         return query.order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc()).all()
 
     @staticmethod
-    def get_all_appointments(status=None, from_date=None, to_date=None):
-        """Get all appointments with optional filters"""
-        query = Appointment.query
+    def get_all_appointments(status=None, from_date=None, to_date=None, stream=False):
+        """
+        Get all appointments with optional filters
+
+        Args:
+            status: Only this status
+            from_date: Earliest appointment date (inclusive)
+            to_date: Latest appointment date (inclusive)
+            stream: Return an iterator that fetches rows in batches of
+                    STREAM_BATCH_SIZE instead of a list (bounded memory for
+                    exports over large ranges)
+
+        Returns:
+            List of Appointment objects, or an iterator of them when streaming
+        """
+        query = Appointment.query.options(*Appointment.detail_options())
 
         if status:
             query = query.filter_by(status=status)
@@ -196,13 +274,22 @@ class Appointment(db.Model):
         if to_date:
             query = query.filter(Appointment.appointment_date <= to_date)
 
-        return query.order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc()).all()
+        query = query.order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc())
+
+        if stream:
+            # Only many-to-one joinedloads in detail_options(), so batching is safe
+            return query.yield_per(Appointment.STREAM_BATCH_SIZE)
+
+        return query.all()
 
     @staticmethod
     def get_today_appointments(doctor_id=None):
-        """Get appointments for today"""
+        """Get appointments for today (with patient loaded for schedule display)"""
+        from sqlalchemy.orm import joinedload
         today = date.today()
-        query = Appointment.query.filter_by(appointment_date=today, status='Booked')
+        query = Appointment.query.options(
+            joinedload(Appointment.patient)
+        ).filter_by(appointment_date=today, status='Booked')
 
         if doctor_id:
             query = query.filter_by(doctor_id=doctor_id)
@@ -211,14 +298,18 @@ class Appointment(db.Model):
 
     @staticmethod
     def get_upcoming_appointments(days=7, doctor_id=None):
-        """Get upcoming appointments for next N days"""
+        """Get upcoming appointments for next N days (with patient loaded)"""
         from datetime import timedelta
+        from sqlalchemy.orm import joinedload
         today = date.today()
-        end_date = today + timedelta(days=days)
+        # Half-open range covering today through today + days
+        end_exclusive = today + timedelta(days=days + 1)
 
-        query = Appointment.query.filter(
+        query = Appointment.query.options(
+            joinedload(Appointment.patient)
+        ).filter(
             Appointment.appointment_date >= today,
-            Appointment.appointment_date <= end_date,
+            Appointment.appointment_date < end_exclusive,
             Appointment.status == 'Booked'
         )
 
@@ -4,7 +4,8 @@ Represents medical professionals in the hospital
 """
 
 from datetime import datetime, date, timedelta
-from extensions import db
+from sqlalchemy.orm import joinedload, raiseload
+from extensions import db, request_cached
 
 
 class Doctor(db.Model):
@@ -36,10 +37,20 @@ class Doctor(db.Model):
     appointments = db.relationship('Appointment', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
     availability_slots = db.relationship('DoctorAvailability', backref='doctor', lazy='dynamic', cascade='all, delete-orphan')
 
-    def __init__(self, user_id, name, specialization_id, license_number=None,
-                 qualification=None, experience_years=None, contact_number=None):
-        """Initialize a new Doctor"""
+    # Index for "most experienced doctors" listings (ORDER BY ... DESC LIMIT n),
+    # plus a PostgreSQL trigram index so ILIKE '%q%' name searches avoid a scan
+    __table_args__ = (
+        db.Index('ix_doctors_experience_desc', experience_years.desc()),
+        db.Index('ix_doctors_name_trgm', name, postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+    def __init__(self, name, specialization_id, license_number=None, qualification=None,
+                 experience_years=None, contact_number=None, user_id=None, user=None):
+        """Initialize a new Doctor (pass user_id for a saved User, or user= to link an unsaved one)"""
         self.user_id = user_id
+        if user is not None:
+            self.user = user
         self.name = name
         self.specialization_id = specialization_id
         self.license_number = license_number
@@ -60,39 +71,69 @@ class Doctor(db.Model):
     def upcoming_appointments(self):
         """Get upcoming appointments (today onwards)"""
         from models.appointment import Appointment
-        today = date.today()
         return self.appointments.filter(
-            Appointment.appointment_date >= today,
-            Appointment.status == 'Booked'
+            Appointment.is_upcoming
         ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
 
-    def get_availability_for_next_7_days(self):
-        """Get availability for next 7 days"""
+    def get_appointment_stats(self, days=7):
+        """
+        Get appointment statistics in a single aggregate query
+
+        Args:
+            days: Window (from today) counted as upcoming
+
+        Returns:
+            Dictionary with total_patients (distinct), completed_appointments,
+            booked_appointments and upcoming_appointments (booked, next N days)
+        """
+        from sqlalchemy import func, case, and_
+        from models.appointment import Appointment
+
         today = date.today()
-        end_date = today + timedelta(days=7)
+        # Half-open range covering today through today + days
+        end_exclusive = today + timedelta(days=days + 1)
+        is_booked = Appointment.status == 'Booked'
 
-        return DoctorAvailability.query.filter(
-            DoctorAvailability.doctor_id == self.id,
-            DoctorAvailability.available_date >= today,
-            DoctorAvailability.available_date <= end_date,
-            DoctorAvailability.is_available == True
-        ).order_by(DoctorAvailability.available_date, DoctorAvailability.start_time).all()
+        row = db.session.query(
+            func.count(func.distinct(Appointment.patient_id)).label('total_patients'),
+            func.count(case((Appointment.status == 'Completed', 1))).label('completed_appointments'),
+            func.count(case((is_booked, 1))).label('booked_appointments'),
+            func.count(case((and_(is_booked,
+                                  Appointment.appointment_date >= today,
+                                  Appointment.appointment_date < end_exclusive), 1))).label('upcoming_appointments'),
+        ).filter(Appointment.doctor_id == self.id).one()
+
+        return dict(row._mapping)
+
+    def get_availability_for_next_7_days(self):
+        """Get availability for next 7 days"""
+        return DoctorAvailability.get_next_7_days(self.id, date.today())
 
     def is_available_on(self, check_date, check_time):
         """Check if doctor is available on specific date and time"""
-        availability = DoctorAvailability.query.filter_by(
-            doctor_id=self.id,
-            available_date=check_date,
-            is_available=True
-        ).all()
-
-        for slot in availability:
-            if slot.start_time <= check_time <= slot.end_time:
-                return True
-        return False
-
-    def to_dict(self, include_availability=False):
-        """Convert doctor to dictionary (for API responses)"""
+        # EXISTS on the matching slot instead of fetching the day's slots
+        return db.session.query(
+            DoctorAvailability.query.filter(
+                DoctorAvailability.doctor_id == self.id,
+                DoctorAvailability.available_date == check_date,
+                DoctorAvailability.is_available.is_(True),
+                DoctorAvailability.start_time <= check_time,
+                DoctorAvailability.end_time >= check_time
+            ).exists()
+        ).scalar()
+
+    def to_dict(self, include_availability=False, total_appointments=None):
+        """
+        Convert doctor to dictionary (for API responses)
+
+        Args:
+            include_availability: Also include the next 7 days of availability
+            total_appointments: Precomputed appointment count (e.g. from
+                                get_all_with_counts()); counted per doctor if None
+        """
+        if total_appointments is None:
+            total_appointments = self.total_appointments
+
         data = {
             'id': self.id,
             'user_id': self.user_id,
@@ -104,7 +145,7 @@ class Doctor(db.Model):
             'experience_years': self.experience_years,
             'contact_number': self.contact_number,
             'profile_image': self.profile_image,
-            'total_appointments': self.total_appointments,
+            'total_appointments': total_appointments,
             'username': self.user.username if self.user else None,
             'email': self.user.email if self.user else None
         }
@@ -117,24 +158,79 @@ class Doctor(db.Model):
         return data
 
     @staticmethod
+    def get_all_with_counts():
+        """
+        Get all doctors with their appointment counts in a single query
+        For serializing lists without one COUNT per doctor
+
+        Returns:
+            List of (Doctor, appointment_count) tuples, ordered by name
+        """
+        from sqlalchemy import func
+        from models.appointment import Appointment
+
+        # Count in a grouped subquery so the eager-loaded columns stay out of GROUP BY
+        counts = db.session.query(
+            Appointment.doctor_id,
+            func.count(Appointment.id).label('appointment_count')
+        ).group_by(Appointment.doctor_id).subquery()
+
+        return db.session.query(
+            Doctor, func.coalesce(counts.c.appointment_count, 0)
+        ).outerjoin(counts, counts.c.doctor_id == Doctor.id).options(
+            joinedload(Doctor.user),
+            joinedload(Doctor.specialization),
+            # Any other lazy load while serializing is an N+1: fail loudly
+            raiseload('*', sql_only=True)
+        ).order_by(Doctor.name).all()
+
+    @staticmethod
+    @request_cached
     def get_by_user_id(user_id):
-        """Get doctor by user ID"""
+        """Get doctor by user ID (memoized for the current request)"""
         return Doctor.query.filter_by(user_id=user_id).first()
 
+    @staticmethod
+    def get_by_user_ids(user_ids):
+        """
+        Get doctors for many user IDs in a single IN query
+
+        Args:
+            user_ids: Iterable of user IDs
+
+        Returns:
+            Dictionary of user_id -> Doctor (IDs without a doctor are omitted)
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+
+        return {
+            doctor.user_id: doctor
+            for doctor in Doctor.query.filter(Doctor.user_id.in_(user_ids)).all()
+        }
+
     @staticmethod
     def get_by_specialization(specialization_id):
-        """Get all doctors by specialization"""
-        return Doctor.query.filter_by(specialization_id=specialization_id).all()
+        """Get all doctors by specialization (with specialization loaded)"""
+        return Doctor.query.options(
+            joinedload(Doctor.specialization)
+        ).filter_by(specialization_id=specialization_id).all()
 
     @staticmethod
     def search(query):
-        """Search doctors by name"""
-        return Doctor.query.filter(Doctor.name.ilike(f'%{query}%')).all()
+        """Search doctors by name (with specialization loaded)"""
+        return Doctor.query.options(
+            joinedload(Doctor.specialization)
+        ).filter(Doctor.name.ilike(f'%{query}%')).all()
 
     @staticmethod
     def get_all_doctors():
-        """Get all doctors"""
-        return Doctor.query.order_by(Doctor.name).all()
+        """Get all doctors (with user and specialization loaded for listings)"""
+        return Doctor.query.options(
+            joinedload(Doctor.user),
+            joinedload(Doctor.specialization)
+        ).order_by(Doctor.name).all()
 
 
 class DoctorAvailability(db.Model):
@@ -157,9 +253,12 @@ class DoctorAvailability(db.Model):
     end_time = db.Column(db.Time, nullable=False)
     is_available = db.Column(db.Boolean, default=True, nullable=False)
 
-    # Composite index for efficient querying
+    # Covering index for the slot lookups (next 7 days, is_available_on):
+    # equality columns first, then the date range and start_time so rows come
+    # back already in (date, start_time) order; end_time completes the cover
     __table_args__ = (
-        db.Index('idx_doctor_date', 'doctor_id', 'available_date'),
+        db.Index('idx_doctor_avail_hot', 'doctor_id', 'is_available', 'available_date',
+                 'start_time', 'end_time'),
     )
 
     def __init__(self, doctor_id, available_date, start_time, end_time, is_available=True):
@@ -180,11 +279,33 @@ class DoctorAvailability(db.Model):
             'id': self.id,
             'doctor_id': self.doctor_id,
             'available_date': self.available_date.isoformat() if self.available_date else None,
-            'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
-            'end_time': self.end_time.strftime('%H:%M') if self.end_time else None,
+            'start_time': self.start_time.isoformat(timespec='minutes') if self.start_time else None,
+            'end_time': self.end_time.isoformat(timespec='minutes') if self.end_time else None,
             'is_available': self.is_available
         }
 
+    @staticmethod
+    def get_next_7_days(doctor_id, today):
+        """
+        Get a doctor's available slots from today through today + 7
+
+        Args:
+            doctor_id: Doctor ID
+            today: First day of the window
+
+        Returns:
+            List of DoctorAvailability ordered by available_date, start_time
+        """
+        # Half-open range, sargable even if the column ever becomes a DATETIME
+        end_exclusive = today + timedelta(days=8)
+
+        return DoctorAvailability.query.filter(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.available_date >= today,
+            DoctorAvailability.available_date < end_exclusive,
+            DoctorAvailability.is_available.is_(True)
+        ).order_by(DoctorAvailability.available_date, DoctorAvailability.start_time).all()
+
     @staticmethod
     def set_doctor_availability(doctor_id, available_date, start_time, end_time):
         """Set or update doctor availability for a specific date"""
@@ -211,9 +332,17 @@ class DoctorAvailability(db.Model):
 
     @staticmethod
     def remove_past_availability():
-        """Remove availability slots for dates before today"""
+        """
+        Remove availability slots for dates before today
+        A single bulk DELETE (uses the available_date index); objects already
+        loaded in the session are not synchronized
+
+        Returns:
+            Number of slots deleted
+        """
         today = date.today()
-        DoctorAvailability.query.filter(
+        deleted = DoctorAvailability.query.filter(
             DoctorAvailability.available_date < today
-        ).delete()
+        ).delete(synchronize_session=False)
         db.session.commit()
+        return deleted
@@ -4,7 +4,8 @@ Represents patients seeking medical care
 """
 
 from datetime import datetime, date
-from extensions import db
+from operator import attrgetter
+from extensions import db, request_cached
 
 
 class Patient(db.Model):
@@ -32,11 +33,24 @@ class Patient(db.Model):
 
     # Relationships
     appointments = db.relationship('Appointment', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
+    # Read-only list form of `appointments` for batch loading with
+    # selectinload() when serializing many patients
+    appointment_list = db.relationship('Appointment', viewonly=True)
 
-    def __init__(self, user_id, name, contact_number, date_of_birth=None,
-                 gender=None, address=None, blood_group=None, emergency_contact=None):
-        """Initialize a new Patient"""
+    # PostgreSQL trigram indexes for ILIKE '%q%' searches on name/contact
+    __table_args__ = (
+        db.Index('ix_patients_name_trgm', name, postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_patients_contact_trgm', contact_number, postgresql_using='gin',
+                 postgresql_ops={'contact_number': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+    def __init__(self, name, contact_number, date_of_birth=None, gender=None, address=None,
+                 blood_group=None, emergency_contact=None, user_id=None, user=None):
+        """Initialize a new Patient (pass user_id for a saved User, or user= to link an unsaved one)"""
         self.user_id = user_id
+        if user is not None:
+            self.user = user
         self.name = name
         self.contact_number = contact_number
         self.date_of_birth = date_of_birth
@@ -69,38 +83,122 @@ class Patient(db.Model):
     @property
     def upcoming_appointments(self):
         """Get upcoming appointments"""
+        return self.get_upcoming_appointments()
+
+    def get_upcoming_appointments(self, limit=None):
+        """
+        Get upcoming appointments (soonest first), with doctor and specialization loaded
+
+        Args:
+            limit: Maximum number of appointments (None for all)
+
+        Returns:
+            List of Appointment objects
+        """
+        from sqlalchemy.orm import joinedload
+        from models.appointment import Appointment
+        from models.doctor import Doctor
+
+        query = self.appointments.options(
+            joinedload(Appointment.doctor).joinedload(Doctor.specialization)
+        ).filter(Appointment.is_upcoming).order_by(Appointment.appointment_date, Appointment.appointment_time)
+
+        if limit:
+            query = query.limit(limit)
+
+        return query.all()
+
+    def get_appointment_stats(self):
+        """
+        Get appointment statistics in a single aggregate query
+
+        Returns:
+            Dictionary with total_appointments, upcoming_appointments and
+            past_appointments (Appointment.is_upcoming / is_past)
+        """
+        from sqlalchemy import func, case
         from models.appointment import Appointment
-        today = date.today()
-        return self.appointments.filter(
-            Appointment.appointment_date >= today,
-            Appointment.status == 'Booked'
-        ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+
+        row = db.session.query(
+            func.count(Appointment.id).label('total_appointments'),
+            func.count(case((Appointment.is_upcoming, 1))).label('upcoming_appointments'),
+            func.count(case((Appointment.is_past, 1))).label('past_appointments'),
+        ).filter(Appointment.patient_id == self.id).one()
+
+        return dict(row._mapping)
 
     @property
     def past_appointments(self):
         """Get past appointments"""
+        return self.get_past_appointments()
+
+    def get_past_appointments(self, limit=None):
+        """
+        Get past appointments (most recent first), with doctor and specialization loaded
+
+        Args:
+            limit: Maximum number of appointments (None for all)
+
+        Returns:
+            List of Appointment objects
+        """
+        from sqlalchemy.orm import joinedload
         from models.appointment import Appointment
+        from models.doctor import Doctor
+
+        # Appointment.is_past is an OR across two columns; as a UNION ALL of
+        # disjoint branches each one can use its own (patient_id, ...) index
         today = date.today()
-        return self.appointments.filter(
-            db.or_(
-                Appointment.appointment_date < today,
-                Appointment.status.in_(['Completed', 'Cancelled'])
-            )
-        ).order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc()).all()
+        before_today = self.appointments.filter(Appointment.appointment_date < today)
+        closed_from_today = self.appointments.filter(
+            Appointment.appointment_date >= today,
+            Appointment.status.in_(['Completed', 'Cancelled'])
+        )
+
+        query = before_today.union_all(closed_from_today).options(
+            joinedload(Appointment.doctor).joinedload(Doctor.specialization)
+        ).order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc())
+
+        if limit:
+            query = query.limit(limit)
+
+        return query.all()
 
     def get_treatment_history(self):
-        """Get complete treatment history"""
+        """Get complete treatment history (with appointment, doctor and specialization loaded)"""
+        from sqlalchemy.orm import contains_eager, joinedload
         from models.treatment import Treatment
+        from models.appointment import Appointment
+        from models.doctor import Doctor
 
-        # Get all treatments for this patient's appointments
-        treatments = Treatment.query.join(Treatment.appointment).filter(
-            Treatment.appointment.has(patient_id=self.id)
+        # Get all treatments for this patient's appointments; the appointment
+        # comes from the filtering join, doctor/specialization are joined in
+        treatments = Treatment.query.join(Treatment.appointment).options(
+            contains_eager(Treatment.appointment)
+            .joinedload(Appointment.doctor)
+            .joinedload(Doctor.specialization)
+        ).filter(
+            Appointment.patient_id == self.id
         ).order_by(Treatment.treatment_date.desc()).all()
 
         return treatments
 
-    def to_dict(self, include_appointments=False):
-        """Convert patient to dictionary (for API responses)"""
+    def to_dict(self, include_appointments=False, total_appointments=None):
+        """
+        Convert patient to dictionary (for API responses)
+
+        Args:
+            include_appointments: Also include upcoming and recent past appointments
+            total_appointments: Precomputed appointment count (e.g. from
+                                get_all_with_counts()); if None, taken from a
+                                batch-loaded appointment_list or counted per patient
+        """
+        # Batch-loaded by get_all_patients(include_appointments=True)
+        list_loaded = 'appointment_list' not in db.inspect(self).unloaded
+
+        if total_appointments is None:
+            total_appointments = len(self.appointment_list) if list_loaded else self.total_appointments
+
         data = {
             'id': self.id,
             'user_id': self.user_id,
@@ -112,40 +210,130 @@ class Patient(db.Model):
             'address': self.address,
             'blood_group': self.blood_group,
             'emergency_contact': self.emergency_contact,
-            'total_appointments': self.total_appointments,
+            'total_appointments': total_appointments,
             'username': self.user.username if self.user else None,
             'email': self.user.email if self.user else None
         }
 
         if include_appointments:
-            data['upcoming_appointments'] = [
-                apt.to_dict() for apt in self.upcoming_appointments
-            ]
-            data['past_appointments'] = [
-                apt.to_dict() for apt in self.past_appointments[:10]  # Last 10
-            ]
+            if not list_loaded:
+                upcoming = self.upcoming_appointments
+                past = self.get_past_appointments(limit=10)  # Last 10
+            else:
+                # Split the loaded collection in Python instead of querying again
+                by_datetime = attrgetter('appointment_date', 'appointment_time')
+                upcoming = sorted((apt for apt in self.appointment_list if apt.is_upcoming),
+                                  key=by_datetime)
+                past = sorted((apt for apt in self.appointment_list if apt.is_past),
+                              key=by_datetime, reverse=True)[:10]
+
+            data['upcoming_appointments'] = [apt.to_dict() for apt in upcoming]
+            data['past_appointments'] = [apt.to_dict() for apt in past]
 
         return data
 
     @staticmethod
+    @request_cached
     def get_by_user_id(user_id):
-        """Get patient by user ID"""
+        """Get patient by user ID (memoized for the current request)"""
         return Patient.query.filter_by(user_id=user_id).first()
 
+    @staticmethod
+    def get_by_user_ids(user_ids):
+        """
+        Get patients for many user IDs in a single IN query
+
+        Args:
+            user_ids: Iterable of user IDs
+
+        Returns:
+            Dictionary of user_id -> Patient (IDs without a patient are omitted)
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+
+        return {
+            patient.user_id: patient
+            for patient in Patient.query.filter(Patient.user_id.in_(user_ids)).all()
+        }
+
     @staticmethod
     def search(query):
-        """Search patients by name or contact number"""
-        return Patient.query.filter(
-            db.or_(
-                Patient.name.ilike(f'%{query}%'),
-                Patient.contact_number.ilike(f'%{query}%')
+        """Search patients by name, contact number, or exact ID"""
+        conditions = [
+            Patient.name.ilike(f'%{query}%'),
+            Patient.contact_number.ilike(f'%{query}%')
+        ]
+        if query.isdigit():
+            conditions.append(Patient.id == int(query))
+
+        return Patient.query.filter(db.or_(*conditions)).all()
+
+    @staticmethod
+    def get_all_patients(include_appointments=False):
+        """
+        Get all patients
+
+        Args:
+            include_appointments: Batch-load each patient's appointments (with
+                                  doctor and specialization) for
+                                  to_dict(include_appointments=True)
+
+        Serializing the batch-loaded list takes exactly two queries (patients,
+        then their appointments), however many patients there are:
+
+            with count_queries(db.engine) as queries:
+                [p.to_dict(include_appointments=True)
+                 for p in Patient.get_all_patients(include_appointments=True)]
+            assert len(queries) == 2
+        """
+        query = Patient.query.order_by(Patient.name)
+
+        if include_appointments:
+            from sqlalchemy.orm import joinedload, selectinload, raiseload
+            from models.appointment import Appointment
+            from models.doctor import Doctor
+
+            query = query.options(
+                joinedload(Patient.user),
+                selectinload(Patient.appointment_list)
+                .joinedload(Appointment.doctor)
+                .joinedload(Doctor.specialization),
+                # Any other lazy load while serializing is an N+1: fail loudly.
+                # Dynamic relationships (appointments) are plain queries and
+                # are not caught, so to_dict() must not touch them here
+                raiseload('*', sql_only=True)
             )
-        ).all()
+
+        return query.all()
 
     @staticmethod
-    def get_all_patients():
-        """Get all patients"""
-        return Patient.query.order_by(Patient.name).all()
+    def get_all_with_counts():
+        """
+        Get all patients with their appointment counts in a single query
+        For serializing lists without one COUNT per patient
+
+        Returns:
+            List of (Patient, appointment_count) tuples, ordered by name
+        """
+        from sqlalchemy import func
+        from sqlalchemy.orm import joinedload, raiseload
+        from models.appointment import Appointment
+
+        # Count in a grouped subquery so the eager-loaded columns stay out of GROUP BY
+        counts = db.session.query(
+            Appointment.patient_id,
+            func.count(Appointment.id).label('appointment_count')
+        ).group_by(Appointment.patient_id).subquery()
+
+        return db.session.query(
+            Patient, func.coalesce(counts.c.appointment_count, 0)
+        ).outerjoin(counts, counts.c.patient_id == Patient.id).options(
+            joinedload(Patient.user),
+            # Any other lazy load while serializing is an N+1: fail loudly
+            raiseload('*', sql_only=True)
+        ).order_by(Patient.name).all()
 
     @staticmethod
     def validate_blood_group(blood_group):
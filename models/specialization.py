@@ -3,7 +3,7 @@ Specialization Model
 Represents medical departments/specializations
 """
 
-from extensions import db
+from extensions import db, request_cached
 
 
 class Specialization(db.Model):
@@ -23,6 +23,15 @@ class Specialization(db.Model):
 
     # Relationships
     doctors = db.relationship('Doctor', backref='specialization', lazy='dynamic')
+    # Read-only list form of `doctors` that can be batch-loaded with
+    # selectinload() for list pages (a dynamic relationship cannot be)
+    doctor_list = db.relationship('Doctor', viewonly=True, order_by='Doctor.name')
+
+    # PostgreSQL trigram index for ILIKE '%q%' searches on name
+    __table_args__ = (
+        db.Index('ix_specializations_name_trgm', name, postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     def __init__(self, name, description=None):
         """Initialize a new Specialization"""
@@ -34,23 +43,62 @@ class Specialization(db.Model):
         return f'<Specialization {self.name}>'
 
     @property
+    @request_cached
     def doctor_count(self):
-        """Get count of doctors in this specialization"""
+        """Get count of doctors in this specialization (memoized for the current request)"""
         return self.doctors.count()
 
-    def to_dict(self):
-        """Convert specialization to dictionary (for API responses)"""
+    def to_dict(self, doctor_count=None):
+        """
+        Convert specialization to dictionary (for API responses)
+
+        Args:
+            doctor_count: Precomputed doctor count (e.g. from
+                          get_all_with_counts()); counted per row if None
+        """
+        if doctor_count is None:
+            doctor_count = self.doctor_count
+
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
-            'doctor_count': self.doctor_count
+            'doctor_count': doctor_count
         }
 
     @staticmethod
-    def get_all_specializations():
-        """Get all specializations"""
-        return Specialization.query.order_by(Specialization.name).all()
+    def get_all_specializations(include_doctors=False):
+        """
+        Get all specializations
+
+        Args:
+            include_doctors: Batch-load doctor_list for every specialization
+                             (one extra IN query instead of one per row)
+        """
+        query = Specialization.query.order_by(Specialization.name)
+
+        if include_doctors:
+            from sqlalchemy.orm import selectinload
+            query = query.options(selectinload(Specialization.doctor_list))
+
+        return query.all()
+
+    @staticmethod
+    def get_all_with_counts():
+        """
+        Get all specializations with their doctor counts in a single query
+
+        Returns:
+            List of (Specialization, doctor_count) tuples, ordered by name
+        """
+        from sqlalchemy import func
+        from models.doctor import Doctor
+
+        return db.session.query(
+            Specialization, func.count(Doctor.id)
+        ).outerjoin(
+            Doctor, Doctor.specialization_id == Specialization.id
+        ).group_by(Specialization.id).order_by(Specialization.name).all()
 
     @staticmethod
     def get_by_name(name):
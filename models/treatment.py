@@ -31,6 +31,12 @@ class Treatment(db.Model):
     treatment_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # PostgreSQL trigram index for ILIKE '%q%' searches on diagnosis
+    __table_args__ = (
+        db.Index('ix_treatments_diagnosis_trgm', diagnosis, postgresql_using='gin',
+                 postgresql_ops={'diagnosis': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
     def __init__(self, appointment_id, diagnosis, prescription=None, notes=None):
         """Initialize a new Treatment record"""
         self.appointment_id = appointment_id
@@ -77,7 +83,7 @@ class Treatment(db.Model):
         from models.appointment import Appointment
 
         # Check if appointment exists
-        appointment = Appointment.query.get(appointment_id)
+        appointment = db.session.get(Appointment, appointment_id)
         if not appointment:
             return False, "Appointment not found.", None
 
@@ -100,7 +106,7 @@ class Treatment(db.Model):
             )
             db.session.add(treatment)
 
-            # Mark appointment as completed
+            # Mark appointment as completed (same transaction as the treatment)
             appointment.mark_completed()
 
             db.session.commit()
@@ -39,6 +39,11 @@ class User(UserMixin, db.Model):
     doctor = db.relationship('Doctor', backref='user', uselist=False, cascade='all, delete-orphan')
     patient = db.relationship('Patient', backref='user', uselist=False, cascade='all, delete-orphan')
 
+    # Composite index for joins that filter on active accounts
+    __table_args__ = (
+        db.Index('ix_users_active_id', 'is_active', 'id'),
+    )
+
     def __init__(self, username, email, password_hash, role):
         """Initialize a new User"""
         self.username = username
@@ -78,6 +83,23 @@ class User(UserMixin, db.Model):
         """Check if user is patient"""
         return self.role == 'patient'
 
+    def password_needs_rehash(self, log_rounds):
+        """
+        Check whether the stored bcrypt hash uses a weaker work factor
+        than configured (never rehashes down to a lower cost)
+
+        Args:
+            log_rounds: Currently configured bcrypt cost (BCRYPT_LOG_ROUNDS)
+
+        Returns:
+            True if the hash should be regenerated with the current cost
+        """
+        # bcrypt hashes look like $2b$<cost>$<salt+digest>
+        parts = (self.password_hash or '').split('$')
+        if len(parts) < 4 or not parts[2].isdigit():
+            return True
+        return int(parts[2]) < log_rounds
+
     def to_dict(self):
         """Convert user to dictionary (for API responses)"""
         return {
@@ -89,6 +111,71 @@ class User(UserMixin, db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+    @staticmethod
+    def find_conflicts(username=None, email=None, exclude_user_id=None):
+        """
+        Check whether a username and/or email is already taken
+        Uses one query that returns only comparison flags, not user rows
+
+        Args:
+            username: Username to check (skipped if None)
+            email: Email to check (skipped if None)
+            exclude_user_id: User ID to ignore (e.g. the user being edited)
+
+        Returns:
+            Tuple of (username_taken, email_taken)
+        """
+        checks = []
+        if username is not None:
+            checks.append(User.username == username)
+        if email is not None:
+            checks.append(User.email == email)
+        if not checks:
+            return False, False
+
+        query = db.session.query(
+            (User.username == username).label('username_taken'),
+            (User.email == email).label('email_taken')
+        ).filter(db.or_(*checks))
+        if exclude_user_id is not None:
+            query = query.filter(User.id != exclude_user_id)
+
+        username_taken = email_taken = False
+        for row in query.limit(2):
+            username_taken = username_taken or bool(row.username_taken)
+            email_taken = email_taken or bool(row.email_taken)
+
+        return username_taken, email_taken
+
+    # Unique indexes behind username/email (unique=True + index=True)
+    UNIQUE_CONSTRAINT_FIELDS = {
+        'ix_users_username': 'username',
+        'ix_users_email': 'email',
+    }
+
+    @staticmethod
+    def find_integrity_conflicts(error, username, email):
+        """
+        Work out which unique user field an IntegrityError collided on
+        Uses the violated constraint name when the driver reports it
+        (psycopg2's diag.constraint_name); otherwise re-runs find_conflicts()
+        against the committed rows. Call after the session is rolled back.
+
+        Args:
+            error: sqlalchemy.exc.IntegrityError from the failed commit
+            username: Username that was being inserted
+            email: Email that was being inserted
+
+        Returns:
+            Tuple of (username_taken, email_taken)
+        """
+        diag = getattr(error.orig, 'diag', None)
+        field = User.UNIQUE_CONSTRAINT_FIELDS.get(getattr(diag, 'constraint_name', None))
+        if field:
+            return field == 'username', field == 'email'
+
+        return User.find_conflicts(username=username, email=email)
+
     @staticmethod
     def validate_role(role):
         """Validate user role"""
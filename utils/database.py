@@ -3,11 +3,22 @@ Database Utility Functions
 Handles database initialization and seed data
 """
 
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from datetime import date
+
+from flask_sqlalchemy.pagination import QueryPagination
+from sqlalchemy import select, func, case, and_, bindparam, event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from extensions import cache
 from models.user import User
 from models.admin import Admin
-from models.doctor import Doctor
+from models.doctor import Doctor, DoctorAvailability
 from models.patient import Patient
 from models.specialization import Specialization
+from models.appointment import Appointment
+from utils.helpers import group_slots_by_date
 
 
 def init_db(db, bcrypt):
@@ -817,8 +828,8 @@ def cleanup_old_data():
 
     try:
         # Remove past availability slots
-        DoctorAvailability.remove_past_availability()
-        print("[+] Cleaned up past availability slots")
+        removed = DoctorAvailability.remove_past_availability()
+        print(f"[+] Cleaned up {removed} past availability slots")
 
     except Exception as e:
         print(f"[X] Error cleaning up data: {str(e)}")
@@ -851,6 +862,329 @@ def get_database_stats():
     return stats
 
 
+def _count_all(model):
+    """Scalar subquery counting every row of a model's table"""
+    return select(func.count()).select_from(model).scalar_subquery()
+
+
+def _count_where(condition):
+    """Conditional aggregate: number of rows matching condition"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+# Statistics statements are built once at import and reused, so each call
+# only binds parameters and hits SQLAlchemy's compiled-statement cache
+
+# One round-trip: each total is a scalar subquery of a single SELECT
+HOME_STATS_STMT = select(*(
+    _count_all(model) for model in (Doctor, Patient, Appointment, Specialization)
+))
+
+# Entity totals are scalar subqueries; appointment figures are conditional
+# aggregates over one scan of the appointments table
+DASHBOARD_STATS_STMT = select(
+    _count_all(Doctor).label('total_doctors'),
+    _count_all(Patient).label('total_patients'),
+    _count_all(Specialization).label('total_specializations'),
+    func.count(Appointment.id).label('total_appointments'),
+    _count_where(Appointment.status == 'Booked').label('booked_appointments'),
+    _count_where(Appointment.status == 'Completed').label('completed_appointments'),
+    _count_where(Appointment.status == 'Cancelled').label('cancelled_appointments'),
+    _count_where(and_(Appointment.appointment_date == bindparam('today'),
+                      Appointment.status == 'Booked')).label('pending_appointments'),
+).select_from(Appointment)
+
+
+@cache.memoize(timeout=60)
+def get_home_stats():
+    """
+    Get the landing page statistics
+    Cached for a short time since these totals change slowly
+
+    Returns:
+        Tuple of (total_doctors, total_patients, total_appointments, total_specializations)
+    """
+    from extensions import db
+
+    return tuple(db.session.execute(HOME_STATS_STMT).one())
+
+
+@cache.memoize(timeout=30)
+def get_dashboard_stats(today):
+    """
+    Get the admin dashboard statistics in a single query
+    Cached briefly per day; writes invalidate via clear_stats_cache()
+
+    Args:
+        today: Date used for the "pending today" count
+
+    Returns:
+        Dictionary of dashboard counts
+    """
+    from extensions import db
+
+    row = db.session.execute(DASHBOARD_STATS_STMT, {'today': today}).one()
+    return dict(row._mapping)
+
+
+# Lightweight, picklable row type for cached specialization listings
+SpecializationSummary = namedtuple(
+    'SpecializationSummary', ['id', 'name', 'description', 'doctor_count']
+)
+
+
+@cache.memoize(timeout=3600)
+def get_specialization_summaries():
+    """
+    Get all specializations (by name) with their doctor counts
+    Reference data that rarely changes, so it is cached; committed writes
+    to specializations or doctors invalidate it (see the ORM events below)
+
+    Returns:
+        Tuple of SpecializationSummary
+    """
+    from extensions import db
+
+    rows = (
+        db.session.query(
+            Specialization.id,
+            Specialization.name,
+            Specialization.description,
+            func.count(Doctor.id),
+        )
+        .outerjoin(Doctor, Doctor.specialization_id == Specialization.id)
+        .group_by(Specialization.id)
+        .order_by(Specialization.name)
+        .all()
+    )
+
+    return tuple(SpecializationSummary(*row) for row in rows)
+
+
+def get_top_specializations(limit=6):
+    """
+    Get the first specializations by name with their doctor counts
+
+    Args:
+        limit: Maximum number of specializations to return
+
+    Returns:
+        Tuple of SpecializationSummary
+    """
+    return get_specialization_summaries()[:limit]
+
+
+@cache.memoize(timeout=60)
+def get_availability_json(doctor_id, today):
+    """
+    Get a doctor's next-7-days slots grouped by date for the booking form
+    Cached per doctor and day; availability writes call
+    clear_availability_cache()
+
+    Args:
+        doctor_id: Doctor ID
+        today: Date the 7-day window starts from (part of the cache key)
+
+    Returns:
+        Dictionary of ISO date -> list of {'start_time', 'end_time'} ('HH:MM')
+    """
+    return group_slots_by_date(DoctorAvailability.get_next_7_days(doctor_id, today))
+
+
+def clear_availability_cache(doctor_id):
+    """
+    Invalidate a doctor's cached booking-form availability for today
+
+    Only a shared backend (CACHE_TYPE=RedisCache) makes this global; with
+    the default per-process SimpleCache it clears the current worker only,
+    and other workers may serve stale slots until the 60s timeout expires
+    (bookings are still validated against the database).
+
+    Args:
+        doctor_id: Doctor ID
+    """
+    cache.delete_memoized(get_availability_json, doctor_id, date.today())
+
+
+def clear_specialization_cache():
+    """Invalidate the cached specialization listing"""
+    cache.delete_memoized(get_specialization_summaries)
+
+
+# Specialization cache invalidation: mapper events flag the session when a
+# specialization or doctor row changes; the cache is cleared once the
+# transaction commits (never mid-transaction, so no request can re-cache
+# uncommitted or rolled-back data)
+_SPECIALIZATION_CACHE_DIRTY = 'specialization_cache_dirty'
+
+
+def _flag_specialization_cache(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[_SPECIALIZATION_CACHE_DIRTY] = True
+
+
+def _flag_doctor_specialization_change(mapper, connection, target):
+    # Only a moved doctor changes the per-specialization counts
+    if inspect(target).attrs.specialization_id.history.has_changes():
+        _flag_specialization_cache(mapper, connection, target)
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Specialization, _event_name, _flag_specialization_cache)
+event.listen(Doctor, 'after_insert', _flag_specialization_cache)
+event.listen(Doctor, 'after_delete', _flag_specialization_cache)
+event.listen(Doctor, 'after_update', _flag_doctor_specialization_change)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_specialization_cache_on_commit(session):
+    if session.info.pop(_SPECIALIZATION_CACHE_DIRTY, False):
+        clear_specialization_cache()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _reset_specialization_cache_flag(session, previous_transaction):
+    session.info.pop(_SPECIALIZATION_CACHE_DIRTY, None)
+
+
+def clear_stats_cache():
+    """
+    Invalidate cached statistics
+    Call after writes that change doctor/patient/appointment/specialization
+    totals or appointment statuses
+    """
+    cache.delete_memoized(get_home_stats)
+    cache.delete_memoized(get_dashboard_stats)
+
+
+class WindowCountPagination(QueryPagination):
+    """
+    Query pagination that gets the total from the page query itself
+    Adds COUNT(*) OVER () to the SELECT, so rows and total come back in one
+    round-trip instead of a LIMIT query plus a separate COUNT query
+    """
+
+    def _query_items(self):
+        query = self._query_args['query'].add_columns(
+            func.count().over().label('full_count')
+        )
+        rows = query.limit(self.per_page).offset(self._query_offset).all()
+
+        # Every row carries the same total; an empty page (past the end)
+        # has none, so _query_count falls back to a COUNT query
+        self._window_total = rows[0].full_count if rows else None
+        return [row[0] for row in rows]
+
+    def _query_count(self):
+        if self._window_total is not None:
+            return self._window_total
+        return super()._query_count()
+
+
+def paginate(query, page, per_page):
+    """
+    Paginate an ORM query using a windowed count (see WindowCountPagination)
+
+    Args:
+        query: Flask-SQLAlchemy query (ordered)
+        page: Page number (1-indexed)
+        per_page: Items per page
+
+    Returns:
+        Pagination object (items, total, pages, iter_pages(), ...)
+    """
+    return WindowCountPagination(query=query, page=page, per_page=per_page, error_out=False)
+
+
+def install_query_counter(app, threshold):
+    """
+    Count SQL statements per request and log a warning above a threshold
+    Development guard against N+1 regressions (see QUERY_COUNT_WARNING)
+
+    Args:
+        app: Flask application
+        threshold: Maximum number of queries a request may run silently
+    """
+    from flask import g, has_request_context, request
+    from sqlalchemy import event
+    from extensions import db
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            if 'query_statements' not in g:
+                g.query_statements = Counter()
+            g.query_statements[statement] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+
+    @app.after_request
+    def warn_on_query_count(response):
+        statements = g.get('query_statements')
+        query_count = statements.total() if statements else 0
+        if query_count > threshold:
+            # The most repeated statement is usually the lazy load to fix
+            statement, repeats = statements.most_common(1)[0]
+            app.logger.warning('%s %s ran %d SQL queries (threshold %d) - possible N+1; '
+                               'ran %d times: %s',
+                               request.method, request.path, query_count, threshold,
+                               repeats, ' '.join(statement.split())[:200])
+        return response
+
+
+def install_slow_query_logger(app, threshold):
+    """
+    Log SQL statements slower than a threshold at the end of each request
+    Uses Flask-SQLAlchemy's query recording (SQLALCHEMY_RECORD_QUERIES)
+
+    Args:
+        app: Flask application
+        threshold: Duration in seconds above which a query is logged
+    """
+    from flask import request
+    from flask_sqlalchemy.record_queries import get_recorded_queries
+
+    @app.after_request
+    def log_slow_queries(response):
+        for query in get_recorded_queries():
+            if query.duration >= threshold:
+                app.logger.warning('%s %s slow query (%.0f ms) at %s: %s',
+                                   request.method, request.path, query.duration * 1000,
+                                   query.location, ' '.join(query.statement.split())[:200])
+        return response
+
+
+@contextmanager
+def count_queries(bind):
+    """
+    Record the SQL statements executed on an engine while the block runs
+    Useful as an N+1 guard, e.g.:
+
+        with count_queries(db.engine) as queries:
+            client.get('/')
+        assert len(queries) <= 3
+
+    Args:
+        bind: SQLAlchemy engine (or connection) to listen on
+
+    Yields:
+        List that collects each executed statement string
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, 'before_cursor_execute', _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, 'before_cursor_execute', _before_cursor_execute)
+
+
 def print_database_stats():
     """Print database statistics"""
     stats = get_database_stats()
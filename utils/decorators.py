@@ -7,6 +7,18 @@ from functools import wraps
 from flask import abort, flash, redirect, url_for, request
 from flask_login import current_user
 
+# Dashboard endpoint for each role (anything else goes to the home page)
+ROLE_DASHBOARDS = {
+    'admin': 'admin.dashboard',
+    'doctor': 'doctor.dashboard',
+    'patient': 'patient.dashboard',
+}
+
+
+def dashboard_url_for(role):
+    """Return the dashboard URL for a user role"""
+    return url_for(ROLE_DASHBOARDS.get(role, 'index'))
+
 
 def login_required_with_message(f):
     """
@@ -153,14 +165,7 @@ def anonymous_required(f):
     def decorated_function(*args, **kwargs):
         if current_user.is_authenticated:
             # Redirect to appropriate dashboard based on role
-            if current_user.role == 'admin':
-                return redirect(url_for('admin.dashboard'))
-            elif current_user.role == 'doctor':
-                return redirect(url_for('doctor.dashboard'))
-            elif current_user.role == 'patient':
-                return redirect(url_for('patient.dashboard'))
-            else:
-                return redirect(url_for('index'))
+            return redirect(dashboard_url_for(current_user.role))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -187,8 +192,10 @@ def validate_ownership(model, id_param='id', owner_field='user_id'):
             if not resource_id:
                 abort(404)
 
-            # Get resource from database
-            resource = model.query.get(resource_id)
+            # Get resource from database (identity map first)
+            from extensions import db
+
+            resource = db.session.get(model, resource_id)
             if not resource:
                 abort(404)
 
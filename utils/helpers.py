@@ -4,8 +4,16 @@ Common helper functions used throughout the application
 """
 
 from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
 import re
 
+# Compiled once at import; these run on every registration/profile POST
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', re.ASCII)
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\-\(\)]')
+_NON_DIGIT_RE = re.compile(r'\D')
+
 
 def format_date(date_obj, format_string='%Y-%m-%d'):
     """
@@ -93,6 +101,14 @@ def parse_date(date_string, format_string='%Y-%m-%d'):
     if isinstance(date_string, date):
         return date_string
 
+    # Fast path for zero-padded ISO dates (what <input type="date"> sends);
+    # date.fromisoformat is C code, strptime goes through the _strptime module
+    if format_string == '%Y-%m-%d' and len(date_string) == 10 and date_string[4] == date_string[7] == '-':
+        try:
+            return date.fromisoformat(date_string)
+        except ValueError:
+            return None
+
     try:
         return datetime.strptime(date_string, format_string).date()
     except:
@@ -116,6 +132,13 @@ def parse_time(time_string, format_string='%H:%M'):
     if isinstance(time_string, time):
         return time_string
 
+    # Fast path for zero-padded HH:MM (what <input type="time"> sends)
+    if format_string == '%H:%M' and len(time_string) == 5 and time_string[2] == ':':
+        try:
+            return time.fromisoformat(time_string)
+        except ValueError:
+            return None
+
     try:
         return datetime.strptime(time_string, format_string).time()
     except:
@@ -190,18 +213,41 @@ def get_next_n_days(n=7, start_date=None):
         start_date: starting date (default: today)
 
     Returns:
-        List of date objects
+        Tuple of date objects (cached per start date)
     """
     if start_date is None:
         start_date = date.today()
     elif isinstance(start_date, str):
         start_date = parse_date(start_date)
 
-    date_list = []
-    for i in range(n):
-        date_list.append(start_date + timedelta(days=i))
+    return _next_n_days(start_date.toordinal(), n)
 
-    return date_list
+
+@lru_cache(maxsize=16)
+def _next_n_days(start_ordinal, n):
+    """Build the date tuple for get_next_n_days (keyed on the day ordinal)"""
+    return tuple(date.fromordinal(start_ordinal + i) for i in range(n))
+
+
+def group_slots_by_date(slots):
+    """
+    Group availability slots by date for the booking form's JavaScript
+
+    Args:
+        slots: availability slots ordered by available_date, start_time
+
+    Returns:
+        Dictionary of ISO date -> list of {'start_time', 'end_time'} ('HH:MM')
+    """
+    # One pass over the already-sorted rows; no per-slot dict membership checks
+    return {
+        slot_date.isoformat(): [
+            {'start_time': slot.start_time.isoformat(timespec='minutes'),
+             'end_time': slot.end_time.isoformat(timespec='minutes')}
+            for slot in day_slots
+        ]
+        for slot_date, day_slots in groupby(slots, key=attrgetter('available_date'))
+    }
 
 
 def is_weekend(check_date):
@@ -257,8 +303,7 @@ def validate_email(email):
         return False
 
     # Basic email regex pattern
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.fullmatch(email) is not None
 
 
 def validate_phone(phone):
@@ -275,7 +320,7 @@ def validate_phone(phone):
         return False
 
     # Remove spaces, dashes, parentheses
-    clean_phone = re.sub(r'[\s\-\(\)]', '', phone)
+    clean_phone = _PHONE_SEPARATORS_RE.sub('', phone)
 
     # Check if it contains only digits and is 10 digits long
     return clean_phone.isdigit() and len(clean_phone) == 10
@@ -295,7 +340,7 @@ def format_phone(phone):
         return phone
 
     # Remove all non-digit characters
-    digits = re.sub(r'\D', '', phone)
+    digits = _NON_DIGIT_RE.sub('', phone)
 
     # Format as XXX-XXX-XXXX if 10 digits
     if len(digits) == 10:
@@ -428,6 +473,22 @@ def flash_form_errors(form):
             flash(f'{field}: {error}', 'danger')
 
 
+def flash_errors(errors, category='danger'):
+    """
+    Flash a list of validation errors as a single message
+    One session write instead of one per error; lines are joined with <br>
+
+    Args:
+        errors: list of error strings
+        category: flash category
+    """
+    from flask import flash
+    from markupsafe import Markup
+
+    if errors:
+        flash(Markup('<br>').join(errors), category)
+
+
 def allowed_file(filename, allowed_extensions=None):
     """
     Check if file has allowed extension